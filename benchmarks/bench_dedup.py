@@ -0,0 +1,109 @@
+"""Benchmark of event_dedup.dedup_events on synthetic events.
+
+Usage: python benchmarks/bench_dedup.py [n_events]
+
+Exits non-zero unless dedup leaves exactly one event per distinct program.
+"""
+
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import event_dedup
+from event_store import EVENT_FIELDS
+
+PHASE_VARIANTS = {
+    "1": ["Phase 1", "phase I", "Ph 1"],
+    "2a": ["Phase 2a", "phase 2A", "Phase IIa"],
+    "2b": ["Phase 2b", "Phase IIb"],
+    "3": ["Phase 3", "phase III"],
+}
+
+
+# Numbered trials of one drug: near-identical names that must stay apart
+STUDY_SPELLINGS = {
+    "POWER": ["POWER{n}", "POWER {n} study", "the POWER-{n} trial"],
+    "Essential": ["Essential{n}", "Essential {n} study", "the Essential{n} trial"],
+    "RADIANT": ["RADIANT-{n}", "RADIANT {n} study", "Phase 2 RADIANT{n}"],
+    "Study 30": ["Study 30{n}", "study 30{n}", "the Study 30{n} trial"],
+}
+STUDY_NAMES = list(STUDY_SPELLINGS)
+TRIALS_PER_NAME = 3
+DRUGS_PER_COMPANY = 2
+
+
+def make_events(n_events, seed=0):
+    """Builds n_events rows drawn from n_events / 5 distinct programs, each
+    written with random casing, salt suffixes, study and phase spellings.
+
+    Every drug runs numbered trials (POWER1, POWER2, ...) in one phase and
+    indication, so a (company, drug) block holds up to STUDY_NAMES x
+    TRIALS_PER_NAME programs that differ only by their trial number."""
+    rng = random.Random(seed)
+    n_programs = max(1, n_events // 5)
+    trials_per_drug = len(STUDY_NAMES) * TRIALS_PER_NAME
+    programs = []
+    for i in range(n_programs):
+        drug = i // trials_per_drug
+        company = drug // DRUGS_PER_COMPANY
+        drug_rng = random.Random(drug)
+        programs.append(
+            {
+                "company": f"Company {company} Inc",
+                "drug": f"drug{drug:05d}mab",
+                "phase": drug_rng.choice(list(PHASE_VARIANTS)),
+                "study_name": STUDY_NAMES[i % trials_per_drug // TRIALS_PER_NAME],
+                "trial": i % TRIALS_PER_NAME + 1,
+                "program": drug_rng.choice(
+                    ["Essential Tremor", "Epilepsy", "DEE", "Migraine"]
+                ),
+            }
+        )
+
+    rows, drawn = [], set()
+    for _ in range(n_events):
+        i = rng.randrange(n_programs)
+        p = programs[i]
+        drawn.add(i)
+        study = rng.choice(STUDY_SPELLINGS[p["study_name"]]).format(n=p["trial"])
+        row = {field: "not specified" for field in EVENT_FIELDS}
+        row.update(
+            company=(
+                p["company"]
+                if rng.random() < 0.5
+                else p["company"].replace(" Inc", ", Inc.")
+            ),
+            drug=p["drug"] if rng.random() < 0.7 else p["drug"].capitalize() + " HCl",
+            phase=rng.choice(PHASE_VARIANTS[p["phase"]]),
+            study=study if rng.random() < 0.5 else study.upper(),
+            program=p["program"],
+            size=str(rng.randint(10, 1000)) if rng.random() < 0.5 else "not specified",
+            trial_status=rng.choice(["Ongoing", "Completed", "not specified"]),
+        )
+        rows.append(row)
+    return pd.DataFrame(rows), len(drawn)
+
+
+def main():
+    n_events = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    df, n_programs = make_events(n_events)
+
+    start = time.perf_counter()
+    deduped = event_dedup.dedup_events(df)
+    elapsed = time.perf_counter() - start
+
+    print(f"events:            {n_events}")
+    print(f"distinct programs: {n_programs}")
+    print(f"after dedup:       {len(deduped)}")
+    print(f"dedup time:        {elapsed:.2f}s ({n_events / elapsed:,.0f} events/s)")
+    if len(deduped) != n_programs:
+        sys.exit(f"expected {n_programs} events after dedup, got {len(deduped)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""Offline end-to-end benchmark of the extraction pipeline.
+
+Drives common.get_filing_sections, press_release.scrape_press_release,
+FAISSManager.add_filings, FAISSManager.similarity_search_with_context,
+common.format_documents_for_prompt and extract_kpi2.extract_kpi against the
+fakes in benchmarks/fakes.py, at one or more corpus sizes, and reports
+throughput, latency percentiles and peak memory per stage.
+
+Usage:
+    python benchmarks/bench_pipeline.py --scales 8,32,128
+    python benchmarks/bench_pipeline.py --save baseline.json
+    python benchmarks/bench_pipeline.py --baseline baseline.json --tolerance 0.25
+
+With --baseline the run exits non-zero when a stage's p50 latency or
+throughput regresses by more than the tolerance.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import common
+import extract_kpi2
+import llm_pool
+import tracing
+from faiss_manager import FAISSManager
+
+from fakes import FakeChatModel, FakeDriver, FakeSecApi, HashEmbeddings
+
+QUERIES = [
+    "all clinical trial activity, study results, and regulatory events",
+    "ulixacaltamide Essential3 topline results",
+    "NDA submission timeline",
+    "adverse events and safety profile",
+    "vormatrigine ENERGY program enrollment",
+]
+
+
+@contextmanager
+def patched(obj, name, value):
+    original = getattr(obj, name)
+    setattr(obj, name, value)
+    try:
+        yield
+    finally:
+        setattr(obj, name, original)
+
+
+class StageRecorder:
+    """Collects per-call latency, processed item counts and memory for each stage."""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def call(self, stage, items=1):
+        record = self.stages.setdefault(
+            stage, {"latencies": [], "items": 0, "peak_mb": 0.0, "rss_mb": 0.0}
+        )
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        yield
+        record["latencies"].append(time.perf_counter() - start)
+        record["items"] += items
+        record["peak_mb"] = max(
+            record["peak_mb"], tracemalloc.get_traced_memory()[1] / 2**20
+        )
+        record["rss_mb"] = max(record["rss_mb"], tracing.current_rss_mb())
+
+    def results(self):
+        results = {}
+        for stage, record in self.stages.items():
+            latencies = np.array(record["latencies"])
+            total = latencies.sum()
+            results[stage] = {
+                "calls": len(latencies),
+                "items": record["items"],
+                "items_per_second": record["items"] / total if total else float("inf"),
+                "p50_ms": 1000 * float(np.percentile(latencies, 50)),
+                "p95_ms": 1000 * float(np.percentile(latencies, 95)),
+                "p99_ms": 1000 * float(np.percentile(latencies, 99)),
+                "peak_traced_mb": record["peak_mb"],
+                "rss_mb": record["rss_mb"],
+            }
+        return results
+
+
+def run_scale(n_filings, args):
+    recorder = StageRecorder()
+    ticker = "PRAX"
+    sec_api = FakeSecApi(
+        fixtures_dir=args.fixtures,
+        n_filings=n_filings,
+        section_chars=args.section_chars,
+        latency=args.http_latency,
+    )
+    embeddings = HashEmbeddings(latency=args.embedding_latency)
+    llm_pool.set_pool(
+        llm_pool.LLMClientPool(
+            api_keys={"bench_key_1": "bench", "bench_key_2": "bench"},
+            requests_per_minute=10**9,
+            client_factory=lambda key, model, temperature: FakeChatModel(
+                latency=args.llm_latency
+            ),
+        )
+    )
+
+    with tempfile.TemporaryDirectory() as workdir, patched(
+        common, "requests", sec_api
+    ), patched(common, "SEC_API_REQUEST_DELAY", 0), patched(
+        extract_kpi2, "VALIDATION_BATCH_DELAY", 0
+    ):
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            with recorder.call("get_filing_sections", items=n_filings):
+                filings, metadatas = common.get_filing_sections(
+                    ticker, "2020-01-01", sec_api_key="bench"
+                )
+
+            press_filings, press_metadatas = [], []
+            try:
+                import press_release
+            except ImportError as e:
+                print(f"Skipping press release scraping ({e})")
+            else:
+                driver = FakeDriver(
+                    ticker,
+                    fixtures_dir=args.fixtures,
+                    n_releases=max(1, n_filings // 2),
+                    latency=args.http_latency,
+                )
+                with patched(press_release, "SEARCH_PAGE_DELAY", 0), patched(
+                    press_release, "ARTICLE_PAGE_DELAY", 0
+                ):
+                    with recorder.call(
+                        "scrape_press_release", items=len(driver.releases)
+                    ):
+                        press_filings, press_metadatas = (
+                            press_release.scrape_press_release(
+                                ticker, "", start_date="2020-01-01", driver=driver
+                            )
+                        )
+
+            manager = FAISSManager(
+                index_path=os.path.join(workdir, "faiss_index"),
+                embedding_model=embeddings,
+                hash_tracker_path=os.path.join(workdir, "indexed_filings.json"),
+            )
+            for filing, metadata in zip(filings, metadatas):
+                with recorder.call("add_filings", items=1):
+                    manager.add_filings([filing], [metadata])
+            for filing, metadata in zip(press_filings, press_metadatas):
+                with recorder.call("add_filings.press_release", items=1):
+                    manager.add_filings([filing], [metadata], isPressRelease=True)
+
+            # Queries past the first round repeat earlier ones and are served
+            # from the retrieval cache
+            documents_per_query = []
+            for mode in ("vector", "lexical", "hybrid"):
+                for i in range(args.queries):
+                    stage = f"similarity_search_with_context.{mode}"
+                    if i >= len(QUERIES):
+                        stage += ".cached"
+                    with recorder.call(stage):
+                        documents = manager.similarity_search_with_context(
+                            QUERIES[i % len(QUERIES)], k=30, window=2, mode=mode
+                        )
+                    if mode == "vector":
+                        documents_per_query.append(documents)
+
+            prompts = []
+            for documents in documents_per_query:
+                with recorder.call("format_documents_for_prompt", items=len(documents)):
+                    prompts.extend(common.format_documents_for_prompt(documents))
+
+            for prompt in prompts[: args.extractions]:
+                with recorder.call("extract_kpi"):
+                    extract_kpi2.extract_kpi(QUERIES[0], prompt)
+        finally:
+            os.chdir(cwd)
+
+    return recorder.results()
+
+
+def print_results(scale, results):
+    print(f"\n=== {scale} filings ===")
+    print(
+        f"{'stage':<48}{'calls':>6}{'items/s':>12}{'p50 ms':>10}{'p95 ms':>10}"
+        f"{'p99 ms':>10}{'peak MB':>10}{'RSS MB':>9}"
+    )
+    for stage, r in results.items():
+        print(
+            f"{stage:<48}{r['calls']:>6}{r['items_per_second']:>12.1f}{r['p50_ms']:>10.1f}"
+            f"{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['peak_traced_mb']:>10.1f}{r['rss_mb']:>9.0f}"
+        )
+
+
+def find_regressions(all_results, baseline, tolerance):
+    regressions = []
+    for scale, results in all_results.items():
+        for stage, r in results.items():
+            base = baseline.get(scale, {}).get(stage)
+            if base is None:
+                continue
+            if r["p50_ms"] > base["p50_ms"] * (1 + tolerance):
+                regressions.append(
+                    f"{scale} filings / {stage}: p50 {r['p50_ms']:.1f}ms vs {base['p50_ms']:.1f}ms"
+                )
+            if r["items_per_second"] < base["items_per_second"] * (1 - tolerance):
+                regressions.append(
+                    f"{scale} filings / {stage}: {r['items_per_second']:.1f} items/s "
+                    f"vs {base['items_per_second']:.1f}"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--scales", default="8,32", help="comma-separated filing counts"
+    )
+    parser.add_argument("--fixtures", help="directory with recorded responses")
+    parser.add_argument("--section-chars", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=10)
+    parser.add_argument("--extractions", type=int, default=2)
+    parser.add_argument("--http-latency", type=float, default=0.0)
+    parser.add_argument("--embedding-latency", type=float, default=0.0)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--save", help="write results as JSON")
+    parser.add_argument("--baseline", help="compare against saved JSON results")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    all_results = {}
+    for scale in [int(s) for s in args.scales.split(",")]:
+        all_results[str(scale)] = run_scale(scale, args)
+        print_results(scale, all_results[str(scale)])
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(all_results, f, indent=2)
+        print(f"\nSaved results to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(all_results, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nNo regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
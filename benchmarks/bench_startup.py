@@ -0,0 +1,108 @@
+"""Measures cold import time of the pipeline modules against a startup budget.
+
+Each module is imported in a fresh interpreter. The run fails when a module
+exceeds its budget or pulls in a backend (langchain, faiss, selenium, sec-api,
+Elasticsearch, credentials) at import time; those must be initialized on
+first use.
+
+Usage: python benchmarks/bench_startup.py [--repeat N]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds allowed for a cold import of each module
+BUDGETS = {
+    "cfg": 0.1,
+    "tracing": 0.1,
+    "common": 0.5,
+    "llm_pool": 0.2,
+    "faiss_manager": 0.5,
+    "press_release": 0.5,
+    "extract_kpi2": 1.0,
+    "event_store": 1.0,
+    "run_extract": 1.0,
+}
+
+DEFERRED_MODULES = [
+    "adtiam",
+    "sec_api",
+    "d6tflow2",
+    "adtdatasources",
+    "faiss",
+    "langchain_community",
+    "langchain_google_genai",
+    "langchain_text_splitters",
+    "selenium",
+    "bs4",
+    "google.generativeai",
+]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+deferred = {deferred!r}
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in deferred if m in sys.modules]}}))
+"""
+
+
+def measure(module, repeat):
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                PROBE.format(module=module, deferred=DEFERRED_MODULES),
+            ],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        )
+        if output.returncode != 0:
+            return None, output.stderr.strip().splitlines()[-1]
+        runs.append(json.loads(output.stdout.strip().splitlines()[-1]))
+    best = min(runs, key=lambda r: r["seconds"])
+    return best, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'module':<16}{'import s':>10}{'budget s':>10}  eagerly loaded")
+    for module, budget in BUDGETS.items():
+        result, error = measure(module, args.repeat)
+        if error:
+            print(f"{module:<16}{'error':>10}{budget:>10.2f}  {error}")
+            failures.append(f"{module}: {error}")
+            continue
+        print(
+            f"{module:<16}{result['seconds']:>10.3f}{budget:>10.2f}  {', '.join(result['loaded']) or '-'}"
+        )
+        if result["seconds"] > budget:
+            failures.append(
+                f"{module}: {result['seconds']:.3f}s > {budget:.2f}s budget"
+            )
+        if result["loaded"]:
+            failures.append(f"{module}: imports {', '.join(result['loaded'])} eagerly")
+
+    if failures:
+        print("\nStartup budget exceeded:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nAll modules within startup budget.")
+
+
+if __name__ == "__main__":
+    main()
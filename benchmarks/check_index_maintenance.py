@@ -0,0 +1,117 @@
+"""Consistency check of FAISSManager deletion, promotion and compaction.
+
+Indexes four filings sharing boilerplate, deletes the filing that holds the
+canonical copies (promoting every shared chunk at once), then the rest, and
+checks after each step, and after reloading from disk, that the docstore,
+vectors, lexical index and document keys agree.
+
+Usage: python benchmarks/check_index_maintenance.py
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from faiss_manager import FAISSManager
+
+from fakes import HashEmbeddings
+
+N_FILINGS = 4
+N_SHARED = 4
+
+
+def paragraph(words, length=900):
+    text = ""
+    while len(text) < length:
+        text += " ".join(words) + ". "
+    return text.strip()
+
+
+def make_filings():
+    shared = [
+        paragraph(["boilerplate", f"section{i}", "forward", "looking", "statements"])
+        for i in range(N_SHARED)
+    ]
+    filings, metadatas = [], []
+    for f in range(N_FILINGS):
+        unique = [
+            paragraph([f"filing{f}", f"result{i}", "topline", "readout"])
+            for i in range(N_SHARED)
+        ]
+        filings.append("\n\n".join(shared + unique))
+        metadatas.append(
+            {
+                "ticker": "PRAX",
+                "accession": f"000-{f}",
+                "form_type": "10-Q",
+                "filing_date": f"2025-0{f + 1}-15",
+            }
+        )
+    return filings, metadatas
+
+
+def check(manager, deleted_keys, label):
+    """Raises AssertionError when the index is inconsistent."""
+    docstore = manager.index.docstore._dict  # type: ignore
+    live_ids = {
+        doc_id
+        for doc_id in manager.index.index_to_docstore_id.values()
+        if doc_id is not None
+    }
+    assert (
+        set(docstore) == live_ids
+    ), f"{label}: {len(docstore)} docstore chunks for {len(live_ids)} live vectors"
+    assert len(live_ids) == manager.index.index.ntotal - manager.tombstones, (
+        f"{label}: {len(live_ids)} live ids, {manager.index.index.ntotal} vectors, "
+        f"{manager.tombstones} tombstones"
+    )
+    stale_keys = manager.document_keys() & deleted_keys
+    assert not stale_keys, f"{label}: deleted documents still indexed: {stale_keys}"
+    assert len(manager.bm25) == len(
+        live_ids
+    ), f"{label}: {len(manager.bm25)} lexical entries for {len(live_ids)} chunks"
+    for key in deleted_keys:
+        word = f"filing{key.split('-')[1]}"
+        hits = manager.lexical_search_ids(f"{word} topline readout", k=10)
+        assert hits or not live_ids, f"{label}: lexical search found nothing"
+        leaked = [doc_id for doc_id in hits if word in docstore[doc_id].page_content]
+        assert not leaked, f"{label}: lexical search returned deleted chunks {leaked}"
+    print(f"{label}: ok ({len(live_ids)} chunks)")
+
+
+def main():
+    embeddings = HashEmbeddings()
+    filings, metadatas = make_filings()
+    with tempfile.TemporaryDirectory() as workdir:
+
+        def open_manager():
+            return FAISSManager(
+                index_path=os.path.join(workdir, "faiss_index"),
+                embedding_model=embeddings,
+                hash_tracker_path=os.path.join(workdir, "indexed_filings.json"),
+            )
+
+        manager = open_manager()
+        for filing, metadata in zip(filings, metadatas):
+            manager.add_filings([filing], [metadata])
+        check(manager, set(), "indexed")
+
+        # The first filing holds the canonical copy of every shared chunk
+        deleted = {"000-0"}
+        manager.delete_documents(deleted)
+        check(manager, deleted, "deleted canonical filing")
+        check(open_manager(), deleted, "reloaded")
+
+        deleted |= {m["accession"] for m in metadatas[1:]}
+        manager.delete_documents(deleted - {"000-0"})
+        check(manager, deleted, "deleted all filings")
+        manager = open_manager()
+        check(manager, deleted, "reloaded")
+        assert not manager.index.docstore._dict  # type: ignore
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+"""Offline stand-ins for the pipeline's external backends.
+
+- FakeSecApi replaces the ``requests`` module used by common.get_filing_sections
+  and serves sec-api query/extractor responses.
+- FakeDriver replaces the Selenium Chrome driver used by press_release.
+- HashEmbeddings is a deterministic embedding model for FAISSManager.
+- FakeChatModel is a Gemini chat model for llm_pool with configurable latency.
+
+Responses come from recorded fixtures when a fixtures directory is given and
+are generated from a seeded synthetic corpus otherwise. Fixture layout::
+
+    <fixtures>/sec_api/query_<TICKER>.json                 sec-api query response
+    <fixtures>/sec_api/extractor/<accessionNo>_<item>.txt  extractor response text
+    <fixtures>/press_releases/search_<TICKER>_<page>.html  GlobeNewswire search page
+    <fixtures>/press_releases/articles/<slug>.html         GlobeNewswire article page
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from schema import EventCatalyst, EventList, ValidationFeedback
+
+DRUGS = [
+    "ulixacaltamide",
+    "vormatrigine",
+    "relutrigine",
+    "elsunersen",
+    "tavapadon",
+    "zuranolone",
+    "ganaxolone",
+    "soticlestat",
+]
+STUDIES = ["Essential3", "ENERGY", "EMBOLD", "RADIANT", "POWER1", "EMERALD"]
+PHASES = ["Phase 1", "Phase 2a", "Phase 2b", "Phase 3"]
+BOILERPLATE = (
+    "This quarterly report contains forward-looking statements within the meaning "
+    "of the Private Securities Litigation Reform Act of 1995. Such statements are "
+    "subject to risks and uncertainties that could cause actual results to differ "
+    "materially from those expressed or implied. "
+)
+
+
+def synthetic_paragraph(rng):
+    drug = rng.choice(DRUGS)
+    return (
+        f"In {rng.choice(['January', 'April', 'July', 'October'])} {rng.randint(2022, 2025)}, "
+        f"we announced topline results from the {rng.choice(PHASES)} {rng.choice(STUDIES)} "
+        f"study (NCT0{rng.randint(1000000, 9999999)}) of {drug} in {rng.randint(20, 900)} "
+        f"patients. The study {rng.choice(['met', 'did not meet'])} its primary endpoint and "
+        f"{drug} was generally well tolerated with mostly mild treatment-emergent adverse events. "
+        f"We expect to submit an NDA for {drug} in {rng.randint(2025, 2027)}Q{rng.randint(1, 4)}. "
+    )
+
+
+def synthetic_text(rng, n_chars):
+    parts, size = [], 0
+    while size < n_chars:
+        part = BOILERPLATE if rng.random() < 0.2 else synthetic_paragraph(rng)
+        parts.append(part)
+        size += len(part)
+    return "".join(parts)
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, text="", payload=None):
+        self.status_code = status_code
+        self.text = text
+        self._payload = payload
+
+    def json(self):
+        return self._payload if self._payload is not None else json.loads(self.text)
+
+
+class FakeSecApi:
+    """Serves ``requests.post`` (query API) and ``requests.get`` (extractor API)."""
+
+    def __init__(
+        self, fixtures_dir=None, n_filings=8, section_chars=20000, latency=0.0, seed=0
+    ):
+        self.fixtures_dir = fixtures_dir
+        self.n_filings = n_filings
+        self.section_chars = section_chars
+        self.latency = latency
+        self.seed = seed
+        self.filings_by_url = {}
+        self.calls = 0
+
+    def _query_response(self, ticker):
+        if self.fixtures_dir:
+            path = os.path.join(self.fixtures_dir, "sec_api", f"query_{ticker}.json")
+            with open(path) as f:
+                return json.load(f)
+
+        filed_at = datetime(2025, 9, 30)
+        filings = []
+        for i in range(self.n_filings):
+            accession = f"0001689548-{25 - i // 4:02d}-{i:06d}"
+            filings.append(
+                {
+                    "accessionNo": accession,
+                    "formType": "10-Q",
+                    "filedAt": (filed_at - timedelta(days=91 * i)).isoformat(),
+                    "ticker": ticker,
+                    "linkToFilingDetails": f"https://www.sec.gov/Archives/{ticker}/{accession}.htm",
+                }
+            )
+        return {"filings": filings}
+
+    def _section_text(self, filing, item):
+        if self.fixtures_dir:
+            path = os.path.join(
+                self.fixtures_dir,
+                "sec_api",
+                "extractor",
+                f"{filing['accessionNo']}_{item}.txt",
+            )
+            if not os.path.exists(path):
+                return ""
+            with open(path) as f:
+                return f.read()
+
+        seed = f"{self.seed}|{filing['accessionNo']}|{item}"
+        rng = random.Random(hashlib.md5(seed.encode()).hexdigest())
+        return synthetic_text(rng, self.section_chars)
+
+    def post(self, url, json=None, headers=None, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        ticker = re.search(r"ticker:(\S+)", json["query"]).group(1)
+        payload = self._query_response(ticker)
+        for filing in payload.get("filings", []):
+            self.filings_by_url[filing["linkToFilingDetails"]] = filing
+        return FakeResponse(payload=payload)
+
+    def get(self, url, params=None, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        filing = self.filings_by_url.get(params["url"])
+        if filing is None:
+            return FakeResponse(status_code=404)
+        return FakeResponse(text=self._section_text(filing, params["item"]))
+
+
+class FakeDriver:
+    """Selenium driver serving GlobeNewswire search and article pages."""
+
+    def __init__(
+        self, ticker="PRAX", fixtures_dir=None, n_releases=20, latency=0.0, seed=0
+    ):
+        self.ticker = ticker
+        self.fixtures_dir = fixtures_dir
+        self.latency = latency
+        self.page_source = ""
+        self.rng = random.Random(seed)
+        published = datetime(2025, 9, 30, 8, 0)
+        # The last release predates every benchmark start date so scraping stops
+        self.releases = [
+            {
+                "slug": f"{ticker.lower()}-release-{i}",
+                "title": f"{ticker} Announces {self.rng.choice(PHASES)} {self.rng.choice(STUDIES)} Results for {self.rng.choice(DRUGS)} ({i})",
+                "published": (
+                    published - timedelta(days=7 * i)
+                    if i < n_releases
+                    else datetime(2000, 1, 3, 8, 0)
+                ),
+            }
+            for i in range(n_releases + 1)
+        ]
+
+    def _fixture(self, *parts):
+        with open(os.path.join(self.fixtures_dir, "press_releases", *parts)) as f:
+            return f.read()
+
+    def _search_page(self, page):
+        if self.fixtures_dir:
+            return self._fixture(f"search_{self.ticker}_{page}.html")
+        items = "".join(
+            f'<li><div class="mainLink"><a href="/news-release/{r["slug"]}.html">{r["title"]}</a></div>'
+            f'<div class="date-source"><span>{r["published"].strftime("%B %d, %Y %H:%M")} ET</span></div></li>'
+            for r in self.releases[(page - 1) * 100 : page * 100]
+        )
+        return f"<html><body><ul>{items}</ul></body></html>"
+
+    def _article_page(self, slug):
+        if self.fixtures_dir:
+            return self._fixture("articles", f"{slug}.html")
+        rng = random.Random(slug)
+        return (
+            '<html><body><div class="main-container-content">'
+            f"<p>{synthetic_text(rng, 4000)}</p>"
+            f"<p>About {self.ticker}: {BOILERPLATE}</p>"
+            "</div></body></html>"
+        )
+
+    def get(self, url):
+        time.sleep(self.latency)
+        page = re.search(r"[?&]page=(\d+)", url)
+        if "/search/keyword/" in url and page:
+            self.page_source = self._search_page(int(page.group(1)))
+        else:
+            slug = url.rstrip("/").rsplit("/", 1)[-1].removesuffix(".html")
+            self.page_source = self._article_page(slug)
+
+    def find_element(self, by=None, value=None):
+        return self
+
+    def quit(self):
+        pass
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic bag-of-words embeddings: each token is hashed to a signed
+    bucket. ``latency`` is added per call to mimic the remote API."""
+
+    def __init__(self, dim=768, latency=0.0):
+        self.dim = dim
+        self.latency = latency
+        self.calls = 0
+        self.texts = 0
+
+    def _embed(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in re.findall(r"[a-z0-9]+", text.lower()):
+            digest = int.from_bytes(
+                hashlib.blake2b(token.encode(), digest_size=8).digest(), "little"
+            )
+            vector[digest % self.dim] += 1.0 if digest & (1 << 63) else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        self.texts += len(texts)
+        time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        self.calls += 1
+        self.texts += 1
+        time.sleep(self.latency)
+        return self._embed(text)
+
+
+class FakeMessage:
+    def __init__(self, content, prompt):
+        self.content = content
+        self.usage_metadata = {
+            "input_tokens": len(prompt) // 4,
+            "output_tokens": len(content) // 4,
+        }
+
+
+class FakeChatModel:
+    """Chat model returning canned answers after ``latency`` seconds.
+
+    Plain prompts (press release title classification) echo every title back.
+    Structured EventList prompts return one event per drug mentioned in the
+    data section; ValidationFeedback prompts accept the events as accurate.
+    """
+
+    def __init__(self, latency=0.0, max_events=20):
+        self.latency = latency
+        self.max_events = max_events
+        self.calls = 0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        time.sleep(self.latency)
+        titles = prompt.split("Titles:\n", 1)[-1]
+        return FakeMessage(titles, prompt)
+
+    def with_structured_output(self, schema, include_raw=False):
+        return FakeStructuredModel(self, schema, include_raw)
+
+    def events_for(self, prompt):
+        data = prompt.split("[data]", 1)[-1]
+        accession = re.search(r"Accession: (\S+)", data)
+        drugs = []
+        for token in re.findall(r"[a-z]+", data):
+            if token in DRUGS and token not in drugs:
+                drugs.append(token)
+        events = []
+        for drug in drugs[: self.max_events]:
+            event = {field: "not specified" for field in EventCatalyst.model_fields}
+            event.update(
+                company="Praxis Precision Medicines Inc",
+                accession_number=accession.group(1) if accession else "not specified",
+                drug=drug,
+            )
+            events.append(EventCatalyst(**event))
+        return EventList(events=events)
+
+
+class FakeStructuredModel:
+    def __init__(self, model, schema, include_raw):
+        self.model = model
+        self.schema = schema
+        self.include_raw = include_raw
+
+    def invoke(self, prompt):
+        self.model.calls += 1
+        time.sleep(self.model.latency)
+        if self.schema is EventList:
+            parsed = self.model.events_for(prompt)
+        elif self.schema is ValidationFeedback:
+            parsed = ValidationFeedback(is_accurate=True, corrected_data=None)
+        else:
+            raise ValueError(f"FakeChatModel has no answer for {self.schema.__name__}")
+
+        if not self.include_raw:
+            return parsed
+        raw = FakeMessage(parsed.model_dump_json(), prompt)
+        return {"raw": raw, "parsed": parsed, "parsing_error": None}
@@ -0,0 +1,142 @@
+import math
+import os
+import pickle
+import re
+from array import array
+
+import numpy as np
+
+# Words joined by '-', '/' or '.' (drug codes like PRAX-944, accession numbers)
+# are kept whole and also split into their parts.
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-/.][a-z0-9]+)*")
+TOKEN_SPLIT_RE = re.compile(r"[-/.]")
+
+STOPWORDS = set(
+    "a an and are as at be by for from has have in is it its of on or our that "
+    "the this to was we were which will with".split()
+)
+
+
+def tokenize(text):
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token not in STOPWORDS:
+            tokens.append(token)
+        if TOKEN_SPLIT_RE.search(token):
+            tokens.extend(p for p in TOKEN_SPLIT_RE.split(token) if p not in STOPWORDS)
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 inverted index over the chunks of the FAISS docstore.
+
+    Documents are identified by their docstore id and can be added and
+    removed incrementally. Postings are kept as compact typed arrays (internal
+    document number, term frequency) and pickled next to the FAISS index.
+    Removed documents keep their postings until the index is rebuilt.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids = []
+        self.doc_numbers = {}
+        self.doc_lengths = array("I")
+        self.total_length = 0
+        self.postings = {}
+        self.removed_numbers = array("I")
+
+    def __len__(self):
+        return len(self.doc_numbers)
+
+    def add(self, doc_id, text):
+        if doc_id in self.doc_numbers:
+            return
+        number = len(self.doc_ids)
+        self.doc_ids.append(doc_id)
+        self.doc_numbers[doc_id] = number
+
+        counts = {}
+        tokens = tokenize(text)
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, tf in counts.items():
+            docs, tfs = self.postings.setdefault(token, (array("I"), array("H")))
+            docs.append(number)
+            tfs.append(min(tf, 65535))
+
+        self.doc_lengths.append(len(tokens))
+        self.total_length += len(tokens)
+
+    def add_documents(self, doc_ids, texts):
+        for doc_id, text in zip(doc_ids, texts):
+            self.add(doc_id, text)
+
+    def remove(self, doc_id):
+        number = self.doc_numbers.pop(doc_id, None)
+        if number is None:
+            return
+        self.doc_ids[number] = None
+        self.total_length -= self.doc_lengths[number]
+        self.doc_lengths[number] = 0
+        self.removed_numbers.append(number)
+
+    def search(self, query, k=10, allowed_ids=None):
+        """Returns up to k (doc_id, score) pairs, best first, optionally
+        restricted to a set of docstore ids."""
+        n_docs = len(self.doc_numbers)
+        if n_docs == 0:
+            return []
+
+        lengths = np.frombuffer(self.doc_lengths, dtype=np.uint32).astype(np.float32)
+        norm = self.k1 * (1 - self.b + self.b * lengths / (self.total_length / n_docs))
+        removed = np.zeros(len(self.doc_ids), dtype=bool)
+        removed[np.frombuffer(self.removed_numbers, dtype=np.uint32)] = True
+        scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+        for token in set(tokenize(query)):
+            if token not in self.postings:
+                continue
+            docs, tfs = self.postings[token]
+            docs = np.frombuffer(docs, dtype=np.uint32)
+            tfs = np.frombuffer(tfs, dtype=np.uint16).astype(np.float32)
+            # Postings of removed documents do not count towards the frequency
+            df = len(docs) - np.count_nonzero(removed[docs])
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm[docs])
+
+        scores[removed] = 0
+        if allowed_ids is not None:
+            mask = np.zeros(len(self.doc_ids), dtype=bool)
+            mask[
+                [self.doc_numbers[i] for i in allowed_ids if i in self.doc_numbers]
+            ] = True
+            scores[~mask] = 0
+
+        candidates = np.nonzero(scores > 0)[0]
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self.doc_ids[i], float(scores[i])) for i in candidates]
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(self.__dict__, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        with open(path, "rb") as f:
+            index.__dict__.update(pickle.load(f))
+        return index
+
+
+def reciprocal_rank_fusion(rankings, k=60, weights=None):
+    """Fuses ranked id lists: each id scores sum(weight / (k + rank))."""
+    weights = weights or [1.0] * len(rankings)
+    scores = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + weight / (k + rank + 1)
+    return sorted(scores, key=lambda doc_id: -scores[doc_id])
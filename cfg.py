@@ -1,23 +1,69 @@
-import adtiam
+"""Credentials and backend clients, initialized on first use.
 
-adtiam.load_creds('adt-sources')
-adtiam.load_creds('adt-llm')
-adtiam.load_creds('adt-db')
-r = adtiam.load_creds('adt-db')
+Importing this module is free; each credential set is loaded, and the
+sec-api clients created, only when first accessed, e.g. through
+``cfg.cnxn_sec_idx`` or ``cfg.sec_api_key()``.
+"""
 
+import functools
 
-adtiam.check_keys_loaded(['sources.secapid2v','llm.openai','db'])
 
-if adtiam.env=='utest':
-    es_index = 'utest-edu'
-else:
-    es_index = 'filings-sec-textonly'
+@functools.lru_cache(maxsize=None)
+def load_env():
+    """Loads the .env file holding the google_api_key* variables."""
+    from dotenv import load_dotenv
 
-import sec_api
+    load_dotenv()
 
-cnxn_sec_idx = sec_api.QueryApi(api_key=adtiam.creds['sources']['secapid2v']['key'])
-cnxn_sec_docs = sec_api.RenderApi(api_key=adtiam.creds['sources']['secapid2v']['key'])
 
-import d6tflow2.settings.es
+@functools.lru_cache(maxsize=None)
+def load_creds(credential_set, *required_keys):
+    """Loads one adtiam credential set, e.g. 'adt-sources', and checks that
+    the keys its caller needs are present."""
+    import adtiam
 
-d6tflow2.settings.es.init(adtiam.creds['db']['elastics']['cloudid'],adtiam.creds['db']['elastics']['key'])
+    adtiam.load_creds(credential_set)
+    adtiam.check_keys_loaded(list(required_keys))
+    return adtiam.creds
+
+
+def sec_api_key():
+    creds = load_creds("adt-sources", "sources.secapid2v")
+    return creds["sources"]["secapid2v"]["key"]
+
+
+@functools.lru_cache(maxsize=None)
+def _es_index():
+    import adtiam
+
+    if adtiam.env == "utest":
+        return "utest-edu"
+    return "filings-sec-textonly"
+
+
+@functools.lru_cache(maxsize=None)
+def sec_query_api():
+    import sec_api
+
+    return sec_api.QueryApi(api_key=sec_api_key())
+
+
+@functools.lru_cache(maxsize=None)
+def sec_render_api():
+    import sec_api
+
+    return sec_api.RenderApi(api_key=sec_api_key())
+
+
+_LAZY_ATTRIBUTES = {
+    "es_index": _es_index,
+    "cnxn_sec_idx": sec_query_api,
+    "cnxn_sec_docs": sec_render_api,
+}
+
+
+def __getattr__(name):
+    # Keeps cfg.es_index, cfg.cnxn_sec_idx and cfg.cnxn_sec_docs working lazily
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module 'cfg' has no attribute '{name}'")
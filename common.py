@@ -1,16 +1,23 @@
 import hashlib
-import pandas as pd
 import re
 import requests
 import time
-import adtiam
-from langchain_core.documents import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import cfg
+import tracing
 from collections import defaultdict
 from datetime import datetime
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+# Pause between sec-api extractor requests to stay under its rate limit
+SEC_API_REQUEST_DELAY = 0.5
 
 
 def write_df_to_excel(df, file_path):
+    import pandas as pd
+
     try:
         with pd.ExcelWriter(file_path, engine="openpyxl") as writer:
             df.to_excel(writer, index=False)
@@ -40,8 +47,17 @@ def normalize_text(text: str) -> str:
     return text.strip()
 
 
-def get_filing_sections(ticker="PRAX", start_date="2025-01-01") -> tuple:
-    sec_api_key = adtiam.creds["sources"]["secapid2v"]["key"]
+def get_filing_sections(
+    ticker="PRAX", start_date="2025-01-01", sec_api_key=None, hash_tracker=None
+) -> tuple:
+    """Fetches the sections of the ticker's 10-K/10-Q filings since start_date,
+    skipping filings ``hash_tracker`` already records as indexed."""
+    sec_api_key = sec_api_key or cfg.sec_api_key()
+    if hash_tracker is None:
+        # faiss_manager imports this module
+        from faiss_manager import FilingHashTracker
+
+        hash_tracker = FilingHashTracker()
 
     company_data = {
         "MNMD": {"cik": "0001813814", "name": "Mind Medicine (MindMed) Inc"},
@@ -66,9 +82,10 @@ def get_filing_sections(ticker="PRAX", start_date="2025-01-01") -> tuple:
         "sort": [{"filedAt": {"order": "desc"}}],
     }
 
-    query_response = requests.post(
-        query_url, json=query_payload, headers={"Content-Type": "application/json"}
-    )
+    with tracing.timed("http.sec_api.query", ticker=ticker):
+        query_response = requests.post(
+            query_url, json=query_payload, headers={"Content-Type": "application/json"}
+        )
     metadata = []
     query_data = query_response.json()
 
@@ -96,6 +113,13 @@ def get_filing_sections(ticker="PRAX", start_date="2025-01-01") -> tuple:
             "cik": company_data.get(ticker, {}).get("cik", ""),
         }
         metadata.append(filing_metadata)
+        # Already indexed filings are not fetched again
+        if hash_tracker.is_indexed(
+            filing_metadata["accession"], form_type, filing_metadata["filing_date"]
+        ):
+            print(f"Skipping already indexed filing {filing_metadata['accession']}")
+            tracing.incr("cache.indexed_filing_hits")
+            continue
         if form_type == "10-K":
             sections_to_extract = ["1", "1A", "2", "3", "7"]
         elif form_type == "10-Q":
@@ -111,7 +135,10 @@ def get_filing_sections(ticker="PRAX", start_date="2025-01-01") -> tuple:
         filing_text = ""
         for section in sections_to_extract:
             section_params = {"url": filing_url, "item": section, "type": "text"}
-            section_response = requests.get(extractor_base_url, params=section_params)
+            with tracing.timed("http.sec_api.extractor", section=section):
+                section_response = requests.get(
+                    extractor_base_url, params=section_params
+                )
             if section_response.status_code == 200:
                 section_text = section_response.text
                 if section_text and section_text.strip():
@@ -121,7 +148,7 @@ def get_filing_sections(ticker="PRAX", start_date="2025-01-01") -> tuple:
                     f"Failed to extract section {section} from {filing_url}. Status: {section_response.status_code}"
                 )
 
-            time.sleep(0.5)
+            time.sleep(SEC_API_REQUEST_DELAY)
 
         # Clean text for this filing
         filing_text = re.sub(r"<[^>]+>", " ", filing_text)
@@ -130,6 +157,8 @@ def get_filing_sections(ticker="PRAX", start_date="2025-01-01") -> tuple:
 
         documents_texts.append(filing_text)
         documents_metadata.append(filing_metadata)
+        tracing.incr("sec_filings.fetched")
+        tracing.incr("sec_filings.characters", len(filing_text))
 
     print(f"Extracted {len(documents_texts)} sections from {ticker} filings.")
 
@@ -137,7 +166,7 @@ def get_filing_sections(ticker="PRAX", start_date="2025-01-01") -> tuple:
 
 
 def format_documents_for_prompt(
-    documents: list[Document], chunk_size: int = 900000, chunk_overlap: int = 0
+    documents: "list[Document]", chunk_size: int = 900000, chunk_overlap: int = 0
 ) -> list[str]:
     grouped = defaultdict(list)
 
@@ -167,17 +196,117 @@ def format_documents_for_prompt(
 
     output = "\n".join(output_lines)
 
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=chunk_size, chunk_overlap=chunk_overlap
     )
     chunks = splitter.split_text(output)
+    tracing.incr("prompt_chunks", len(chunks))
 
     return chunks
 
 
+EVENT_NOT_SPECIFIED = {"", "not specified", "n/a", "na", "none", "null", "unknown"}
+
+# Salt forms and dosage-form words that do not change which drug is meant
+DRUG_SUFFIXES = {
+    "hcl",
+    "hydrochloride",
+    "sodium",
+    "potassium",
+    "mesylate",
+    "maleate",
+    "tartrate",
+    "citrate",
+    "sulfate",
+    "phosphate",
+    "acetate",
+    "tablets",
+    "tablet",
+    "capsules",
+    "injection",
+    "er",
+    "xr",
+}
+
+ROMAN_PHASES = {"i": "1", "ii": "2", "iii": "3", "iv": "4"}
+
+# Words around a study name that do not change which study is meant
+STUDY_GENERIC_WORDS = {"the", "a", "an", "of", "study", "trial", "program", "clinical"}
+
+
+def normalize_event_value(value) -> str:
+    """Lowercases, strips punctuation and collapses whitespace; placeholders become ''."""
+    text = str(value).lower().strip()
+    if text in EVENT_NOT_SPECIFIED:
+        return ""
+    text = re.sub(r"[^a-z0-9/\- ]+", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def normalize_company_name(value) -> str:
+    text = normalize_event_value(value)
+    text = re.sub(
+        r"\b(inc|incorporated|corp|corporation|co|ltd|plc|llc|sa|ag|nv)\b", " ", text
+    )
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def normalize_drug_name(value) -> str:
+    tokens = normalize_event_value(value).split()
+    while len(tokens) > 1 and tokens[-1] in DRUG_SUFFIXES:
+        tokens.pop()
+    return " ".join(tokens)
+
+
+def normalize_phase(value) -> str:
+    """Maps e.g. 'Phase IIa', 'phase 2A' and 'Ph 2a' to '2a'."""
+    text = normalize_event_value(value)
+    text = re.sub(r"\b(phase|ph)\b", " ", text)
+    text = re.sub(
+        r"\b(iv|iii|ii|i)([a-c]?)\b",
+        lambda m: ROMAN_PHASES[m.group(1)] + m.group(2),
+        text,
+    )
+    return re.sub(r"\s+", "", text)
+
+
+def normalize_study_name(value) -> str:
+    """Maps e.g. 'POWER1', 'Power-1 study' and 'Phase 3 POWER 1 trial' to
+    'power1', and 'Study II' to '2'."""
+    text = normalize_event_value(value)
+    text = re.sub(r"\b(phase|ph)[ -]*(iv|iii|ii|i|[0-9])[a-c]?\b", " ", text)
+    name = ""
+    for token in re.split(r"[^a-z0-9]+", text):
+        # Keeps the letter of 'part a' or 'cohort a'
+        after_part = name.endswith(("part", "cohort", "arm"))
+        if not token or token in STUDY_GENERIC_WORDS and not after_part:
+            continue
+        token = ROMAN_PHASES.get(token, token)
+        # Trial numbers are attached to the name they follow
+        name += token if token.isdigit() and name[-1:].isalpha() else f" {token}"
+    return name.strip()
+
+
 def event_identity_key(event) -> str:
     """Returns a hash of stable identifying fields to detect semantically duplicate events."""
-    key_str = (
-        f"{event.accession_number}|{event.drug}|{event.study}|{event.phase}".lower()
+    key_str = "|".join(
+        [
+            normalize_event_value(event.accession_number),
+            normalize_drug_name(event.drug),
+            normalize_event_value(event.study),
+            normalize_phase(event.phase),
+        ]
     )
     return hashlib.md5(key_str.encode("utf-8")).hexdigest()
+
+
+def document_key(metadata: dict) -> str:
+    """Returns the identifier of the filing or press release a chunk belongs to."""
+    accession = metadata.get("accession")
+    if accession:
+        return accession
+    return (
+        f"{metadata.get('ticker', '')}|press release|{metadata.get('filing_date', '')}"
+    )
@@ -0,0 +1,214 @@
+import re
+import zlib
+import numpy as np
+import pandas as pd
+import common
+
+VECTOR_DIM = 256
+SIMILARITY_THRESHOLD = 0.75
+
+# Events with neither study nor program have nothing to compare by similarity,
+# so they are only merged when all of these fields match exactly
+IDENTITY_FIELDS = (
+    "phase",
+    "regulatory_milestone",
+    "submission_type",
+    "milestone_trigger",
+    "explanation",
+)
+
+
+def _map_unique(values: pd.Series, func) -> np.ndarray:
+    """Applies func once per distinct value; event columns are highly repetitive."""
+    codes, uniques = pd.factorize(values.astype(str))
+    return np.array([func(u) for u in uniques])[codes]
+
+
+def study_markers(study: str) -> str:
+    """Returns the trial, part and cohort numbers of a normalized study name,
+    so numbered trials of one program are never merged however similar their
+    names, e.g. '1' for 'power1' and '2 a' for 'radiant2 part a'."""
+    numbers = re.findall(r"[0-9]+", study)
+    numbers += re.findall(r"\b(?:part|cohort|arm) ([a-z])\b", study)
+    return " ".join(sorted(set(numbers)))
+
+
+def _trigram_vectors(texts: np.ndarray) -> np.ndarray:
+    """Hashes the character trigrams of each text into an L2-normalized count vector."""
+    uniques, inverse = np.unique(texts, return_inverse=True)
+    rows, cols = [], []
+    for row, text in enumerate(uniques):
+        padded = f"  {text} "
+        for i in range(len(padded) - 2):
+            rows.append(row)
+            cols.append(zlib.crc32(padded[i : i + 3].encode()) % VECTOR_DIM)
+
+    vectors = np.zeros((len(uniques), VECTOR_DIM), dtype=np.float32)
+    np.add.at(
+        vectors, (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)), 1.0
+    )
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors /= np.maximum(norms, 1e-9)
+    return vectors[inverse]
+
+
+def _connected_components(linked: np.ndarray) -> np.ndarray:
+    """Labels each node of a symmetric adjacency matrix with the smallest node
+    index of its connected component."""
+    labels = np.arange(len(linked))
+    reachable = linked | np.eye(len(linked), dtype=bool)
+    while True:
+        updated = np.where(reachable, labels[None, :], len(linked)).min(axis=1)
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def cluster_events(df: pd.DataFrame, threshold=SIMILARITY_THRESHOLD) -> np.ndarray:
+    """Assigns a cluster id to every event so that duplicates share an id.
+
+    Events are blocked by normalized (company, drug). Within a block, two
+    events are duplicates when the cosine similarity of their study trigram
+    vectors reaches ``threshold``, their study_markers are equal, and they
+    have the same phase and the same program (indication). An unspecified
+    phase or program takes the value the similar events agree on, if they
+    agree on exactly one; every link requires equal resolved values, so a
+    cluster never spans two phases or programs. An event without a study
+    matches others of its program, and events with a study only if those
+    are all one study. Events without study and program only merge when all
+    IDENTITY_FIELDS match.
+    """
+
+    def column(name, normalize):
+        if name not in df.columns:
+            return np.full(len(df), "")
+        return _map_unique(df[name], normalize)
+
+    company = column("company", common.normalize_company_name)
+    drug = column("drug", common.normalize_drug_name)
+    phases = column("phase", common.normalize_phase)
+    study = column("study", common.normalize_study_name)
+    program = column("program", common.normalize_event_value)
+    identity = column(IDENTITY_FIELDS[0], common.normalize_event_value)
+    for name in IDENTITY_FIELDS[1:]:
+        identity = np.char.add(
+            np.char.add(identity, "|"), column(name, common.normalize_event_value)
+        )
+
+    markers = _map_unique(pd.Series(study), study_markers)
+    vectors = _trigram_vectors(study)
+    clusters = np.arange(len(df))
+    block_codes, _ = pd.factorize(np.char.add(np.char.add(company, "|"), drug))
+    order = np.argsort(block_codes, kind="stable")
+    boundaries = np.nonzero(np.diff(block_codes[order]))[0] + 1
+    for idx in np.split(order, boundaries):
+        if len(idx) < 2:
+            continue
+        block_phases = phases[idx]
+        block_programs = program[idx]
+        block_markers = markers[idx]
+        named = study[idx] != ""
+        unnamed = ~named & (block_programs == "")
+        same_study = (vectors[idx] @ vectors[idx].T >= threshold) & (
+            block_markers[:, None] == block_markers[None, :]
+        )
+
+        def same_program(programs):
+            return (programs[:, None] == programs[None, :]) & (programs != "")[:, None]
+
+        # Events with a study compare by study, the others by program
+        both_named = named[:, None] & named[None, :]
+        similar = np.where(both_named, same_study, same_program(block_programs))
+        similar |= unnamed[:, None] & unnamed[None, :]
+
+        # Resolve an unspecified phase, then an unspecified program, to the
+        # single value the similar events agree on
+        resolved_phases = block_phases.copy()
+        for i in np.nonzero((block_phases == "") & ~unnamed)[0]:
+            agreed = set(block_phases[similar[i] & (block_phases != "") & ~unnamed])
+            if len(agreed) == 1:
+                resolved_phases[i] = agreed.pop()
+        resolved_programs = block_programs.copy()
+        for i in np.nonzero((block_programs == "") & ~unnamed)[0]:
+            candidates = (
+                similar[i]
+                & (block_programs != "")
+                & (resolved_phases == resolved_phases[i])
+            )
+            agreed = set(block_programs[candidates])
+            if len(agreed) == 1:
+                resolved_programs[i] = agreed.pop()
+
+        # An event without a study only joins the events with one if they
+        # are all the same study, so it cannot chain numbered trials
+        similar = np.where(both_named, same_study, same_program(resolved_programs))
+        similar |= unnamed[:, None] & unnamed[None, :]
+        single_study = np.ones(len(idx), dtype=bool)
+        for i in np.nonzero(~named & ~unnamed)[0]:
+            candidates = np.nonzero(
+                similar[i]
+                & named
+                & (resolved_phases == resolved_phases[i])
+                & (resolved_programs == resolved_programs[i])
+            )[0]
+            single_study[i] = same_study[np.ix_(candidates, candidates)].all()
+
+        linked = (
+            similar
+            & (resolved_phases[:, None] == resolved_phases[None, :])
+            & (resolved_programs[:, None] == resolved_programs[None, :])
+            & (unnamed[:, None] == unnamed[None, :])
+            & (
+                (named[:, None] == named[None, :])
+                | (single_study[:, None] & single_study[None, :])
+            )
+        )
+        if unnamed.any():
+            block_identity = identity[idx]
+            linked &= ~unnamed[:, None] | (
+                block_identity[:, None] == block_identity[None, :]
+            )
+
+        clusters[idx] = idx[_connected_components(linked | linked.T)]
+
+    return clusters
+
+
+def dedup_events(df: pd.DataFrame, recency_col=None, threshold=SIMILARITY_THRESHOLD):
+    """Clusters duplicate events and merges each cluster into a single row.
+
+    Rows are treated as more recent the later they appear, or by ``recency_col``
+    when given. Each field of a merged event takes the value of the most recent
+    row where it is specified; equally recent rows are ranked by how much
+    detail they specify.
+    """
+    if df is None or df.empty:
+        return df
+
+    df = df.reset_index(drop=True)
+    clusters = cluster_events(df, threshold=threshold)
+    recency = df[recency_col] if recency_col else pd.Series(np.arange(len(df)))
+
+    unspecified = df.apply(
+        lambda col: _map_unique(
+            col, lambda v: v.strip().lower() in common.EVENT_NOT_SPECIFIED
+        )
+    )
+    values = df.mask(unspecified)
+    lengths = df.apply(lambda col: _map_unique(col, len))
+    specificity = lengths.mask(unspecified, 0).sum(axis=1)
+
+    order = (
+        pd.DataFrame(
+            {"cluster": clusters, "recency": recency, "specificity": specificity}
+        )
+        .sort_values(
+            ["cluster", "recency", "specificity"], ascending=[True, False, False]
+        )
+        .index
+    )
+    merged = values.loc[order].groupby(clusters[order], sort=False).first()
+    first_seen = pd.Series(np.arange(len(df))).groupby(clusters).min()
+    merged = merged.loc[first_seen.sort_values().index]
+
+    return merged.fillna("not specified").reset_index(drop=True)
@@ -0,0 +1,218 @@
+import os
+import re
+import sqlite3
+import uuid
+import pandas as pd
+from datetime import datetime
+from schema import EventCatalyst
+import event_dedup
+
+EVENT_FIELDS = list(EventCatalyst.model_fields.keys())
+LAYERS = ("raw", "validated")
+
+
+class EventStore:
+    """Append-only SQLite store for extracted events.
+
+    Every pipeline run gets a run id; events are written to a ``raw`` layer
+    (straight from extraction) and a ``validated`` layer (after validation),
+    and never updated in place. The current event table of a ticker is derived
+    from the validated layer of its completed runs, less the events of
+    documents retired from the index.
+    """
+
+    def __init__(self, path="output/events.db"):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.create_tables()
+
+    def create_tables(self):
+        event_columns = ", ".join(f"{f} TEXT COLLATE NOCASE" for f in EVENT_FIELDS)
+        with self.conn:
+            self.conn.executescript(f"""
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    run_id TEXT UNIQUE NOT NULL,
+                    ticker TEXT NOT NULL,
+                    run_date TEXT NOT NULL,
+                    started_at TEXT NOT NULL,
+                    finished_at TEXT,
+                    status TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_runs_ticker ON runs (ticker, run_date);
+
+                CREATE TABLE IF NOT EXISTS events (
+                    run_seq INTEGER NOT NULL REFERENCES runs (run_seq),
+                    ticker TEXT NOT NULL,
+                    layer TEXT NOT NULL,
+                    {event_columns}
+                );
+                CREATE INDEX IF NOT EXISTS idx_events_ticker ON events (ticker, layer, run_seq);
+                CREATE INDEX IF NOT EXISTS idx_events_drug ON events (drug);
+                CREATE INDEX IF NOT EXISTS idx_events_trial_status ON events (trial_status);
+                CREATE INDEX IF NOT EXISTS idx_events_status_announce ON events (status_announce);
+
+                CREATE TABLE IF NOT EXISTS run_documents (
+                    run_seq INTEGER NOT NULL REFERENCES runs (run_seq),
+                    ticker TEXT NOT NULL,
+                    document_key TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_run_documents_ticker ON run_documents (ticker);
+
+                CREATE TABLE IF NOT EXISTS retired_documents (
+                    document_key TEXT NOT NULL,
+                    retired_seq INTEGER NOT NULL
+                );
+                """)
+
+    def close(self):
+        self.conn.close()
+
+    def start_run(self, ticker):
+        now = datetime.now()
+        run_id = f"{now.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO runs (run_id, ticker, run_date, started_at, status) VALUES (?, ?, ?, ?, ?)",
+                (run_id, ticker, now.strftime("%Y-%m-%d"), now.isoformat(), "running"),
+            )
+        return run_id
+
+    def finish_run(self, run_id, status="completed", doc_keys=()):
+        """Closes a run and records the documents its events were extracted from.
+
+        Documents are only recorded for completed runs, so a failed run is
+        retried in full on the next invocation."""
+        run_seq, ticker = self._run(run_id)
+        with self.conn:
+            if status == "completed":
+                self.conn.executemany(
+                    "INSERT INTO run_documents (run_seq, ticker, document_key) VALUES (?, ?, ?)",
+                    [(run_seq, ticker, key) for key in doc_keys],
+                )
+            self.conn.execute(
+                "UPDATE runs SET finished_at = ?, status = ? WHERE run_seq = ?",
+                (datetime.now().isoformat(), status, run_seq),
+            )
+
+    def _run(self, run_id):
+        row = self.conn.execute(
+            "SELECT run_seq, ticker FROM runs WHERE run_id = ?", (run_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(f"Unknown run id {run_id}")
+        return row
+
+    def append_events(self, run_id, layer, df):
+        if layer not in LAYERS:
+            raise ValueError(f"Unknown layer {layer}, expected one of {LAYERS}")
+        if df is None or df.empty:
+            return 0
+        run_seq, ticker = self._run(run_id)
+        values = df.reindex(columns=EVENT_FIELDS).fillna("not specified").astype(str)
+        columns = ", ".join(["run_seq", "ticker", "layer"] + EVENT_FIELDS)
+        placeholders = ", ".join(["?"] * (len(EVENT_FIELDS) + 3))
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT INTO events ({columns}) VALUES ({placeholders})",
+                (
+                    (run_seq, ticker, layer, *row)
+                    for row in values.itertuples(index=False, name=None)
+                ),
+            )
+        return len(values)
+
+    def extracted_documents(self, ticker):
+        rows = self.conn.execute(
+            "SELECT document_key FROM run_documents WHERE ticker = ?", (ticker,)
+        ).fetchall()
+        return {row[0] for row in rows}
+
+    def forget_documents(self, doc_keys):
+        """Un-records documents deleted from or replaced in the index, so they
+        are extracted again if re-indexed, and retires the events of earlier
+        runs that carry their accession number. Press release events have no
+        accession and stay current until superseded by newer events. A run
+        still in progress keeps the events it extracts from a re-indexed
+        version of the document."""
+        doc_keys = list(doc_keys)
+        if not doc_keys:
+            return
+        with self.conn:
+            (retired_seq,) = self.conn.execute(
+                "SELECT COALESCE(MAX(run_seq), 0) FROM runs WHERE status = 'completed'"
+            ).fetchone()
+            self.conn.executemany(
+                "DELETE FROM run_documents WHERE document_key = ?",
+                [(key,) for key in doc_keys],
+            )
+            self.conn.executemany(
+                "INSERT INTO retired_documents (document_key, retired_seq) VALUES (?, ?)",
+                [(key, retired_seq) for key in doc_keys],
+            )
+
+    def retired_accessions(self):
+        """Maps the digits of each retired accession number to the last run
+        whose events it retires."""
+        rows = self.conn.execute(
+            "SELECT document_key, MAX(retired_seq) FROM retired_documents GROUP BY document_key"
+        ).fetchall()
+        retired = {}
+        for key, retired_seq in rows:
+            accession = re.sub(r"[^0-9]", "", key)
+            if accession and "|press release|" not in key:
+                retired[accession] = max(retired_seq, retired.get(accession, 0))
+        return retired
+
+    def query(
+        self,
+        ticker=None,
+        drug=None,
+        status=None,
+        layer="validated",
+        run_id=None,
+        completed_only=True,
+    ):
+        """Returns stored events matching all given filters. ``drug`` matches
+        case-insensitively and ``status`` matches either status field."""
+        clauses = ["e.layer = ?"]
+        params = [layer]
+        if ticker is not None:
+            clauses.append("e.ticker = ?")
+            params.append(ticker)
+        if drug is not None:
+            clauses.append("e.drug = ?")
+            params.append(drug)
+        if status is not None:
+            clauses.append("(e.trial_status = ? OR e.status_announce = ?)")
+            params.extend([status, status])
+        if run_id is not None:
+            clauses.append("r.run_id = ?")
+            params.append(run_id)
+        if completed_only:
+            clauses.append("r.status = 'completed'")
+
+        sql = f"""
+            SELECT r.run_id, r.run_seq, r.run_date, e.ticker, {", ".join("e." + f for f in EVENT_FIELDS)}
+            FROM events e JOIN runs r ON r.run_seq = e.run_seq
+            WHERE {" AND ".join(clauses)}
+            ORDER BY e.run_seq, e.rowid
+        """
+        return pd.read_sql_query(sql, self.conn, params=params)
+
+    def current_events(self, ticker):
+        """Returns the merged event table of a ticker: duplicate validated events
+        across completed runs are merged, preferring the most recent run."""
+        df = self.query(ticker=ticker)
+        retired = self.retired_accessions()
+        if retired and not df.empty:
+            accessions = df["accession_number"].str.replace(r"[^0-9]", "", regex=True)
+            retired_before = accessions.map(retired).fillna(-1)
+            df = df[df["run_seq"] > retired_before].reset_index(drop=True)
+        if df.empty:
+            return df
+        current = event_dedup.dedup_events(df, recency_col="run_seq")
+        return current.drop(columns=["run_seq"])
@@ -1,19 +1,17 @@
 import pandas as pd
 from schema import EventList, ValidationFeedback
-import adtiam
-import os
 from typing import List
 import json
 from datetime import datetime
-from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
 import common
+import grounding
+import llm_pool
+import tracing
 import math
 import time
 
-load_dotenv()
-adtiam.load_creds("adt-llm")
-os.environ["OPENAI_API_KEY"] = adtiam.creds["llm"]["openai"]
+# Pause between validation batches to spread requests over the rate limit window
+VALIDATION_BATCH_DELAY = 0.5
 
 
 def get_validation_prompt(
@@ -59,20 +57,33 @@ Output the result as a JSON object of `ValidationFeedback`.
     return validation_prompt
 
 
-def batched_validate_output(search_chunks: List[str], result: EventList, batch_size=5):
+def batched_validate_output(
+    search_chunks: List[str], result: EventList, batch_size=5, precheck=True
+):
 
     df_metrics = pd.DataFrame()
-    os.environ["GOOGLE_API_KEY"] = os.getenv("google_api_key3") or "your_api_key_here"
-
-    client = ChatGoogleGenerativeAI(model="gemini-2.5-pro", temperature=0)
-    structured_client = client.with_structured_output(ValidationFeedback)
+    pool = llm_pool.get_pool()
 
     validated_events = []
     seen_keys = set()
     all_events = result.events
+
+    # Events whose key fields are all found in the source text are accepted
+    # without a validation call
+    if precheck:
+        grounded_events, all_events = grounding.precheck_events(
+            all_events, search_chunks
+        )
+        for event in grounded_events:
+            key = common.event_identity_key(event)
+            if key not in seen_keys:
+                validated_events.append(event)
+                seen_keys.add(key)
+
     total_batches = math.ceil(len(all_events) / batch_size)
 
-    print("\nUsing Gemini API to validate KPIs (batched)...")
+    if total_batches:
+        print("\nUsing Gemini API to validate KPIs (batched)...")
 
     for i in range(total_batches):
         batch_events = all_events[i * batch_size : (i + 1) * batch_size]
@@ -80,7 +91,9 @@ def batched_validate_output(search_chunks: List[str], result: EventList, batch_s
         validation_prompt = get_validation_prompt(search_chunks, partial_result)
 
         try:
-            validation_response = structured_client.invoke(validation_prompt)
+            validation_response = pool.invoke(
+                validation_prompt, schema=ValidationFeedback
+            )
 
             if validation_response:
                 validation_result = ValidationFeedback.model_validate(
@@ -104,13 +117,17 @@ def batched_validate_output(search_chunks: List[str], result: EventList, batch_s
             print(f"Validation error in batch {i+1}: {e}")
             validated_events.extend(batch_events)  # fallback: accept originals
 
-        time.sleep(0.5)
+        time.sleep(VALIDATION_BATCH_DELAY)
 
     df_metrics = pd.DataFrame([e.model_dump() for e in validated_events])
     return df_metrics
 
 
-def extract_kpi(search_metric, search_chunks):
+def extract_kpi(search_metric, search_chunks, store=None, run_id=None):
+    # A single prompt chunk would otherwise be joined character by character
+    if isinstance(search_chunks, str):
+        search_chunks = [search_chunks]
+
     today = datetime.now()
     formatted_date = today.strftime("%Y-%m-%d")
 
@@ -181,26 +198,23 @@ Output the result as a JSON list of `EventCatalyst` objects, like:
     print(len(llm_prompt), " - characters in prompt")
     print("Using Gemini API to extract KPIs...")
 
-    os.environ["GOOGLE_API_KEY"] = os.getenv("google_api_key") or "your_api_key_here"
-    client = ChatGoogleGenerativeAI(model="gemini-2.5-pro", temperature=0)
-    structured_client = client.with_structured_output(EventList)
-
-    response = structured_client.invoke(llm_prompt)
+    response = llm_pool.get_pool().invoke(llm_prompt, schema=EventList)
 
     result = None
 
     result = EventList.model_validate(response)
 
-    os.makedirs("output", exist_ok=True)
-    common.write_df_to_excel(
-        pd.DataFrame([e.model_dump() for e in result.events]),
-        "./output/kpi_original.xlsx",
-    )
+    if store is not None:
+        store.append_events(
+            run_id, "raw", pd.DataFrame([e.model_dump() for e in result.events])
+        )
 
     df_metrics = pd.DataFrame()
 
     if result and result.events:
-        df_metrics = batched_validate_output(search_chunks, result, 5)
+        tracing.incr("events.extracted", len(result.events))
+        with tracing.stage("extract.validate"):
+            df_metrics = batched_validate_output(search_chunks, result, 5)
 
     else:
         print("No events found in the response.")
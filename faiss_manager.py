@@ -1,74 +1,236 @@
 import os
 import json
 import hashlib
-import os
-from langchain_community.vectorstores import FAISS
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_core.documents import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import cfg
+import common
+import tracing
+from bm25_index import BM25Index, reciprocal_rank_fusion
+from near_duplicates import MinHashLSH
+from query_cache import QueryCache
+
+# langchain, faiss and the Gemini client are imported where they are first
+# used, so modules that only need FilingHashTracker stay cheap to import.
+
+# Deleted chunks leave tombstoned vectors behind; the index is compacted
+# once they make up this share of it
+COMPACTION_RATIO = 0.25
+
+
+def default_embedding_model():
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    cfg.load_env()
+    if not os.environ.get("GOOGLE_API_KEY"):
+        os.environ["GOOGLE_API_KEY"] = os.getenv("google_api_key") or ""
+    return GoogleGenerativeAIEmbeddings(model="models/embedding-001")
+
+
+def chunk_id(metadata):
+    """Docstore id of a chunk, stable across runs."""
+    key = f"{common.document_key(metadata)}#{metadata.get('chunk_index')}"
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def chunk_locations(doc):
+    """(document key, chunk index, ticker) of every filing a chunk appears in:
+    its own, followed by those of the near-duplicate chunks it stands in for."""
+    locations = [
+        (
+            common.document_key(doc.metadata),
+            doc.metadata.get("chunk_index"),
+            doc.metadata.get("ticker"),
+        )
+    ]
+    for duplicate in doc.metadata.get("duplicates", []):
+        locations.append(
+            (
+                duplicate["document_key"],
+                duplicate["chunk_index"],
+                duplicate.get("ticker"),
+            )
+        )
+    return locations
+
 
-if not os.environ.get("GOOGLE_API_KEY"):
-    os.environ["GOOGLE_API_KEY"] = os.getenv("google_api_key") or ""
+def metadata_from_document_key(document_key, ticker=None):
+    """Minimal chunk metadata for a document known only by its key."""
+    if "|press release|" in document_key:
+        ticker, _, filing_date = document_key.split("|")
+        return {
+            "ticker": ticker,
+            "form_type": "press release",
+            "filing_date": filing_date,
+        }
+    return {"ticker": ticker, "accession": document_key}
 
 
 class FilingHashTracker:
+    """Hashes of the filings and press releases already indexed, each mapped
+    to its document key and the docstore ids of its chunks."""
+
     def __init__(self, path="indexed_filings.json"):
         self.path = path
         self.hashes = self.load_hashes()
 
     def load_hashes(self):
         if not os.path.exists(self.path):
-            return set()
+            return {}
         with open(self.path, "r") as f:
-            return set(json.load(f))
+            hashes = json.load(f)
+        if isinstance(hashes, list):
+            # Written before filings were linked to their chunks
+            return {h: {"document_key": None, "ids": []} for h in hashes}
+        return hashes
 
     def save_hashes(self):
         with open(self.path, "w") as f:
-            json.dump(list(self.hashes), f)
+            json.dump(self.hashes, f)
 
     def get_hash(self, accession, form_type, filing_date):
         filing_str = f"{accession}_{form_type}_{filing_date}"
         return hashlib.md5(filing_str.encode()).hexdigest()
 
+    def metadata_hash(self, metadata):
+        if metadata.get("accession"):
+            return self.get_hash(
+                metadata["accession"],
+                metadata.get("form_type"),
+                metadata.get("filing_date"),
+            )
+        return self.get_hash(
+            metadata.get("ticker"), "press release", metadata.get("filing_date")
+        )
+
     def is_indexed(self, accession, form_type, filing_date):
         return self.get_hash(accession, form_type, filing_date) in self.hashes
 
-    def mark_indexed(self, accession, form_type, filing_date):
-        self.hashes.add(self.get_hash(accession, form_type, filing_date))
+    def mark_indexed(
+        self, accession, form_type, filing_date, document_key=None, ids=()
+    ):
+        self.hashes[self.get_hash(accession, form_type, filing_date)] = {
+            "document_key": document_key,
+            "ids": list(ids),
+        }
         self.save_hashes()
 
+    def add_ids(self, document_key, ids):
+        for entry in self.hashes.values():
+            if entry["document_key"] == document_key:
+                entry["ids"].extend(ids)
+        self.save_hashes()
+
+    def forget(self, document_keys, hashes=()):
+        """Unmarks filings, by document key or hash, so they can be indexed again."""
+        forgotten = [
+            h
+            for h, entry in self.hashes.items()
+            if h in hashes or entry["document_key"] in document_keys
+        ]
+        for h in forgotten:
+            del self.hashes[h]
+        self.save_hashes()
+        return len(forgotten)
+
 
 class FAISSManager:
-    def __init__(self, index_path="faiss_index"):
+    def __init__(
+        self,
+        index_path="faiss_index",
+        embedding_model=None,
+        hash_tracker_path="indexed_filings.json",
+        event_store=None,
+    ):
         self.index_path = index_path
-        self.embedding_model = GoogleGenerativeAIEmbeddings(
-            model="models/embedding-001"
-        )
+        # EventStore told about deleted documents, see delete_documents
+        self.event_store = event_store
+        self.embedding_model = embedding_model or default_embedding_model()
         self.index = None
-        self.hash_tracker = FilingHashTracker()
+        # Number of vectors whose chunks were deleted, see delete_documents
+        self.tombstones = 0
+        self.bm25 = BM25Index()
+        self.bm25_path = os.path.join(index_path, "bm25.pkl")
+        self.near_duplicates = MinHashLSH()
+        self.near_duplicates_path = os.path.join(index_path, "minhash.pkl")
+        # Bumped on every change to the stored index; retrieval results are
+        # cached per version
+        self.version = 0
+        self.version_path = os.path.join(index_path, "version.json")
+        # Chunk lookups of the current version, see chunk_map
+        self._chunk_map = None
+        self.query_cache = QueryCache(os.path.join(index_path, "query_cache.db"))
+        self.hash_tracker = FilingHashTracker(hash_tracker_path)
         self.load_index()
 
     def load_index(self):
         if os.path.exists(self.index_path):
+            from langchain_community.vectorstores import FAISS
+
             self.index = FAISS.load_local(
                 self.index_path,
                 self.embedding_model,
                 allow_dangerous_deserialization=True,
             )
             print(f"Loaded FAISS index from {self.index_path}")
+            self.tombstones = sum(
+                doc_id is None for doc_id in self.index.index_to_docstore_id.values()
+            )
+            self.load_bm25()
+            self.load_near_duplicates()
+            if os.path.exists(self.version_path):
+                with open(self.version_path, "r") as f:
+                    self.version = json.load(f)["version"]
         else:
             self.index = None
             print("No existing FAISS index found.")
 
+    def load_bm25(self):
+        docstore = self.index.docstore._dict  # type: ignore
+        if os.path.exists(self.bm25_path):
+            self.bm25 = BM25Index.load(self.bm25_path)
+        if len(self.bm25) != len(docstore):
+            # Index built before the lexical index existed, backfill it
+            print(f"Building BM25 index over {len(docstore)} chunks...")
+            self.bm25 = BM25Index()
+            for doc_id, doc in docstore.items():
+                self.bm25.add(doc_id, doc.page_content)
+            self.bm25.save(self.bm25_path)
+
+    def load_near_duplicates(self):
+        docstore = self.index.docstore._dict  # type: ignore
+        if os.path.exists(self.near_duplicates_path):
+            self.near_duplicates = MinHashLSH.load(self.near_duplicates_path)
+        if len(self.near_duplicates) != len(docstore):
+            print(f"Building MinHash signatures for {len(docstore)} chunks...")
+            self.near_duplicates = MinHashLSH()
+            for doc_id, doc in docstore.items():
+                self.near_duplicates.insert(
+                    doc_id, self.near_duplicates.signature(doc.page_content)
+                )
+            self.near_duplicates.save(self.near_duplicates_path)
+
     def save_index(self):
         if self.index is not None:
             self.index.save_local(self.index_path)
+            self.bm25.save(self.bm25_path)
+            self.near_duplicates.save(self.near_duplicates_path)
+            self.version += 1
+            with open(self.version_path, "w") as f:
+                json.dump({"version": self.version}, f)
+            self.query_cache.prune("retrieval", self.version)
             print(f"Saved FAISS index to {self.index_path}")
 
     def add_filings(self, filings, metadatas, isPressRelease=False):
+        from langchain_community.vectorstores import FAISS
+        from langchain_core.documents import Document
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
         print()
         splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
         new_documents = []
+        # Chunks to embed by id, so later chunks in the batch can point at them
+        pending = {}
+        docstore = self.index.docstore._dict if self.index is not None else {}  # type: ignore
+        near_duplicate_chunks = 0
         for filing_text, metadata in zip(filings, metadatas):
             ticker = metadata.get("ticker")
             if not isPressRelease:
@@ -78,6 +240,7 @@ class FAISSManager:
 
                 if self.hash_tracker.is_indexed(accession, form_type, filing_date):
                     print(f"Skipping already indexed filing {accession}")
+                    tracing.incr("cache.indexed_filing_hits")
                     continue
 
             else:
@@ -87,84 +250,447 @@ class FAISSManager:
 
                 if self.hash_tracker.is_indexed(ticker, form_type, filing_date):
                     print(f"Skipping already indexed filing {ticker}")
+                    tracing.incr("cache.indexed_filing_hits")
                     continue
 
             # Chunk filing text
             chunks = splitter.split_text(filing_text)
 
             # Convert chunks to Documents with metadata
+            # Near-exact copies of an indexed chunk (boilerplate, risk factors,
+            # "About" footers) are not embedded; the canonical chunk records
+            # where else it appears instead.
             docs = []
             for idx, chunk in enumerate(chunks):
                 chunk_metadata = metadata.copy()
                 chunk_metadata["chunk_index"] = idx
-                docs.append(Document(page_content=chunk, metadata=chunk_metadata))
+                signature = self.near_duplicates.signature(chunk)
+                canonical = None
+                for candidate_id in self.near_duplicates.query(signature):
+                    candidate = pending.get(candidate_id) or docstore.get(candidate_id)
+                    if candidate is not None and self.near_duplicates.is_duplicate(
+                        chunk, candidate.page_content
+                    ):
+                        canonical = candidate
+                        break
+                if canonical is not None:
+                    canonical.metadata.setdefault("duplicates", []).append(
+                        {
+                            "document_key": common.document_key(chunk_metadata),
+                            "chunk_index": idx,
+                            "ticker": ticker,
+                        }
+                    )
+                    near_duplicate_chunks += 1
+                    continue
+                doc = Document(page_content=chunk, metadata=chunk_metadata)
+                doc_id = chunk_id(chunk_metadata)
+                self.near_duplicates.insert(doc_id, signature)
+                pending[doc_id] = doc
+                docs.append(doc)
 
             new_documents.extend(docs)
 
+            doc_key = common.document_key(metadata)
+            doc_ids = [chunk_id(doc.metadata) for doc in docs]
             if not isPressRelease:
-                self.hash_tracker.mark_indexed(accession, form_type, filing_date)
+                self.hash_tracker.mark_indexed(
+                    accession, form_type, filing_date, doc_key, doc_ids
+                )
             else:
                 ticker = ticker
-                self.hash_tracker.mark_indexed(ticker, form_type, filing_date)
+                self.hash_tracker.mark_indexed(
+                    ticker, form_type, filing_date, doc_key, doc_ids
+                )
+
+        if near_duplicate_chunks:
+            print(f"Skipped {near_duplicate_chunks} near-duplicate chunks")
+            tracing.incr("ingest.near_duplicate_chunks", near_duplicate_chunks)
 
         if not new_documents:
+            if near_duplicate_chunks:
+                # Back-references were added to stored chunks
+                self.save_index()
             print("No new filings to add.")
             return
 
-        if self.index is None:
-            print(f"Building new FAISS index with {len(new_documents)} chunks...")
-            self.index = FAISS.from_documents(new_documents, self.embedding_model)
+        ids = [chunk_id(doc.metadata) for doc in new_documents]
+
+        tracing.incr("embeddings.documents", len(new_documents))
+        with tracing.timed("embedding.documents", chunks=len(new_documents)):
+            if self.index is None:
+                print(f"Building new FAISS index with {len(new_documents)} chunks...")
+                self.index = FAISS.from_documents(
+                    new_documents, self.embedding_model, ids=ids
+                )
+            else:
+                print(f"Adding {len(new_documents)} chunks to existing FAISS index...")
+                self.index.add_documents(new_documents, ids=ids)
+
+        self.bm25.add_documents(ids, [doc.page_content for doc in new_documents])
+        self.save_index()
+
+    def delete_documents(self, doc_keys):
+        """Removes filings and press releases, given by document key (accession
+        number or 'ticker|press release|date'), from the index.
+
+        Their chunks leave the docstore, lexical and near-duplicate indexes
+        right away, while their vectors are only tombstoned until compact()
+        runs. A deleted chunk that other documents share as a near-duplicate
+        is kept, re-assigned to the first of those documents. With an event
+        store, the documents are also un-recorded as extracted and their
+        events retired. Returns the number of chunks deleted.
+        """
+        doc_keys = set(doc_keys)
+        if self.event_store is not None and doc_keys:
+            self.event_store.forget_documents(doc_keys)
+        if self.index is None or not doc_keys:
+            return 0
+
+        docstore = self.index.docstore._dict  # type: ignore
+        positions = {
+            doc_id: position
+            for position, doc_id in self.index.index_to_docstore_id.items()
+            if doc_id is not None
+        }
+        deleted, templates = [], {}
+        for doc_id, doc in docstore.items():
+            duplicates = doc.metadata.get("duplicates")
+            if duplicates:
+                doc.metadata["duplicates"] = [
+                    d for d in duplicates if d["document_key"] not in doc_keys
+                ]
+            doc_key = common.document_key(doc.metadata)
+            if doc_key in doc_keys:
+                deleted.append((doc_id, doc))
+            else:
+                templates.setdefault(doc_key, doc.metadata)
+
+        promoted = []
+        for doc_id, doc in deleted:
+            del docstore[doc_id]
+            self.index.index_to_docstore_id[positions[doc_id]] = None
+            self.bm25.remove(doc_id)
+            signature = self.near_duplicates.signatures.get(doc_id)
+            self.near_duplicates.remove(doc_id)
+
+            survivors = doc.metadata.get("duplicates")
+            if not survivors:
+                continue
+            # Promote the chunk to the first document that still contains it,
+            # reusing its stored vector
+            owner = survivors[0]
+            metadata = dict(
+                templates.get(owner["document_key"])
+                or metadata_from_document_key(owner["document_key"], owner["ticker"])
+            )
+            metadata.pop("duplicates", None)
+            metadata["chunk_index"] = owner["chunk_index"]
+            if survivors[1:]:
+                metadata["duplicates"] = survivors[1:]
+            vector = self.index.index.reconstruct(positions[doc_id])
+            promoted.append(
+                (doc.page_content, vector, metadata, signature, owner["document_key"])
+            )
+
+        if promoted:
+            # Added only once every deletion is done: the docstore replaces its
+            # dict on add, which would leave `docstore` above stale
+            new_ids = [chunk_id(metadata) for _, _, metadata, _, _ in promoted]
+            self.index.add_embeddings(
+                [(text, vector) for text, vector, _, _, _ in promoted],
+                metadatas=[metadata for _, _, metadata, _, _ in promoted],
+                ids=new_ids,
+            )
+            for new_id, (text, _, _, signature, owner_key) in zip(new_ids, promoted):
+                self.bm25.add(new_id, text)
+                if signature is not None:
+                    self.near_duplicates.insert(new_id, signature)
+                self.hash_tracker.add_ids(owner_key, [new_id])
+            tracing.incr("index.promoted_chunks", len(promoted))
+
+        self.tombstones += len(deleted)
+        self.hash_tracker.forget(
+            doc_keys,
+            hashes={
+                self.hash_tracker.metadata_hash(doc.metadata) for _, doc in deleted
+            },
+        )
+        print(f"Deleted {len(deleted)} chunks of {len(doc_keys)} documents")
+        tracing.incr("index.deleted_chunks", len(deleted))
+
+        if self.tombstones > COMPACTION_RATIO * self.index.index.ntotal:
+            self.compact()
         else:
-            print(f"Adding {len(new_documents)} chunks to existing FAISS index...")
-            self.index.add_documents(new_documents)
+            self.save_index()
+        return len(deleted)
+
+    def delete_ticker(self, ticker, press_releases_only=False):
+        """Removes every filing, or only the press releases, of a ticker."""
+        doc_keys = self.document_keys(ticker)
+        if press_releases_only:
+            doc_keys = {k for k in doc_keys if k.startswith(f"{ticker}|press release|")}
+        return self.delete_documents(doc_keys)
+
+    def replace_filing(self, document_key, filing, metadata, isPressRelease=False):
+        """Replaces a superseded document, e.g. a 10-Q by its 10-Q/A or a
+        re-published press release, with a new version."""
+        self.delete_documents([document_key])
+        self.add_filings([filing], [metadata], isPressRelease=isPressRelease)
+
+    def compact(self):
+        """Drops tombstoned vectors from the FAISS index and rebuilds the BM25
+        index. Stored vectors are kept, nothing is re-embedded."""
+        import numpy as np
+
+        if self.index is None or not self.tombstones:
+            return
 
+        index_to_docstore_id = self.index.index_to_docstore_id
+        dead = [p for p, doc_id in index_to_docstore_id.items() if doc_id is None]
+        live = [
+            doc_id
+            for _, doc_id in sorted(index_to_docstore_id.items())
+            if doc_id is not None
+        ]
+        with tracing.timed("index.compact", tombstones=len(dead)):
+            # Remaining vectors keep their order, so positions shift down
+            self.index.index.remove_ids(np.array(dead, dtype=np.int64))
+            index_to_docstore_id.clear()
+            index_to_docstore_id.update(enumerate(live))
+
+            docstore = self.index.docstore._dict  # type: ignore
+            self.bm25 = BM25Index()
+            for doc_id in live:
+                self.bm25.add(doc_id, docstore[doc_id].page_content)
+
+        print(f"Compacted FAISS index, dropped {len(dead)} deleted vectors")
+        self.tombstones = 0
         self.save_index()
 
     def similarity_search(self, query, k=100):
         if self.index is None:
             raise RuntimeError("FAISS index is not built yet.")
-        return self.index.similarity_search(query, k=k)
+        docstore = self.index.docstore._dict  # type: ignore
+        return [docstore[doc_id] for doc_id in self.vector_search_ids(query, k)]
+
+    def document_keys(self, ticker=None):
+        """Returns the keys of all filings and press releases stored in the index."""
+        if self.index is None:
+            return set()
+        keys = set()
+        for doc in self.index.docstore._dict.values():  # type: ignore
+            for doc_key, _, doc_ticker in chunk_locations(doc):
+                if ticker is None or doc_ticker == ticker:
+                    keys.add(doc_key)
+        return keys
+
+    def embed_query(self, query):
+        """Embeds a search query, reusing earlier embeddings of the same text."""
+        import numpy as np
+
+        model = getattr(self.embedding_model, "model", None)
+        parts = [model or type(self.embedding_model).__name__, query]
+        embedding = self.query_cache.get("embedding", parts)
+        if embedding is not None:
+            tracing.incr("cache.query_embedding_hits")
+            return embedding
+
+        tracing.incr("embeddings.queries")
+        with tracing.timed("embedding.query"):
+            embedding = self.embedding_model.embed_query(query)
+        embedding = np.asarray(embedding, dtype=np.float32)
+        self.query_cache.put("embedding", parts, embedding)
+        return embedding
+
+    def chunk_map(self):
+        """Returns, for the current index version, the chunk ids of each
+        document by chunk index, the set of chunk ids of each document
+        (near-duplicates included), the metadata of a stored chunk of each
+        document, and the vector position of each chunk id."""
+        if self._chunk_map is None or self._chunk_map[0] != self.version:
+            filing_chunks, document_ids, templates = {}, {}, {}
+            for doc_id, doc in self.index.docstore._dict.items():  # type: ignore
+                templates.setdefault(common.document_key(doc.metadata), doc.metadata)
+                for filing_id, chunk_idx, _ in chunk_locations(doc):
+                    document_ids.setdefault(filing_id, set()).add(doc_id)
+                    if chunk_idx is not None:
+                        filing_chunks.setdefault(filing_id, {})[chunk_idx] = doc_id
+            positions = {
+                doc_id: position
+                for position, doc_id in self.index.index_to_docstore_id.items()
+                if doc_id is not None
+            }
+            self._chunk_map = (
+                self.version,
+                filing_chunks,
+                document_ids,
+                templates,
+                positions,
+            )
+        return self._chunk_map[1:]
+
+    def vector_search_ids(self, query, k, allowed_ids=None):
+        """Returns the docstore ids of the k chunks closest to the query embedding."""
+        import faiss
+        import numpy as np
 
-    def similarity_search_with_context(self, query, k=35, window=1):
+        vector = np.array([self.embed_query(query)], dtype=np.float32)
+        if getattr(self.index, "_normalize_L2", False):
+            faiss.normalize_L2(vector)
+
+        # With a filter, FAISS only scores the vectors of allowed chunks;
+        # otherwise allow for tombstoned vectors among the results
+        params = None
+        if allowed_ids is not None:
+            positions = self.chunk_map()[3]
+            allowed = np.array(
+                sorted(positions[doc_id] for doc_id in allowed_ids), dtype=np.int64
+            )
+            fetch_k = min(k, len(allowed))
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(allowed))
+        else:
+            fetch_k = min(k + self.tombstones, self.index.index.ntotal)
+        if fetch_k == 0:
+            return []
+        with tracing.timed("retrieval.vector_search", k=k):
+            _, indices = self.index.index.search(vector, fetch_k, params=params)
+
+        ids = []
+        for i in indices[0]:
+            if i == -1:
+                continue
+            doc_id = self.index.index_to_docstore_id[i]
+            if doc_id is not None:
+                ids.append(doc_id)
+                if len(ids) == k:
+                    break
+        return ids
+
+    def lexical_search_ids(self, query, k, allowed_ids=None):
+        """Returns the docstore ids of the k best BM25 matches; no embedding needed."""
+        with tracing.timed("retrieval.lexical_search", k=k):
+            return [doc_id for doc_id, _ in self.bm25.search(query, k, allowed_ids)]
+
+    def search_ids(self, query, k, mode="vector", allowed_ids=None):
+        """Top-k chunk ids by 'vector', 'lexical' or 'hybrid' search. Hybrid mode
+        fuses the rankings of both searches with reciprocal rank fusion."""
+        if mode == "vector":
+            return self.vector_search_ids(query, k, allowed_ids)
+        if mode == "lexical":
+            return self.lexical_search_ids(query, k, allowed_ids)
+        if mode == "hybrid":
+            rankings = [
+                self.vector_search_ids(query, 2 * k, allowed_ids),
+                self.lexical_search_ids(query, 2 * k, allowed_ids),
+            ]
+            return reciprocal_rank_fusion(rankings)[:k]
+        raise ValueError(
+            f"Unknown search mode {mode}, expected vector, lexical or hybrid"
+        )
+
+    def similarity_search_with_context(
+        self, query, k=35, window=1, doc_keys=None, mode="vector"
+    ):
         print(
             f"Searching for '{query}' and retrieving top {k} chunks with window {window}..."
         )
         if self.index is None:
             raise RuntimeError("FAISS index is not built yet.")
 
-        # Step 1: Get top-k most similar chunks
-        top_docs = self.index.similarity_search(query, k=k)
-
-        # Step 2: Load all chunks from docstore
-        all_chunks = list(self.index.docstore._dict.values())  # type: ignore
-
-        # Step 3: Organize chunks by filing id and index
-        filing_chunks = {}
-        for doc in all_chunks:
-            filing_id = doc.metadata.get(
-                "accession"
-            )  # or use combined key if you prefer
-            chunk_idx = doc.metadata.get("chunk_index")
-            if filing_id is not None and chunk_idx is not None:
-                filing_chunks.setdefault(filing_id, {})[chunk_idx] = doc
-
-        # Step 4: For each top chunk, add neighbors within window
-        expanded_chunks = {}
-        for doc in top_docs:
-            filing_id = doc.metadata.get("accession")
-            chunk_idx = doc.metadata.get("chunk_index")
-            if filing_id in filing_chunks:
+        docstore = self.index.docstore._dict  # type: ignore
+
+        # Identical searches against an unchanged index return the cached chunks
+        templates = {}
+        cache_parts = [
+            query,
+            k,
+            window,
+            sorted(doc_keys) if doc_keys is not None else None,
+            mode,
+            self.version,
+        ]
+        cached = self.query_cache.get("retrieval", cache_parts)
+        if cached is not None:
+            print(f"Found {len(cached)} chunks (cached)")
+            tracing.incr("cache.retrieval_hits")
+            tracing.incr("retrieval.chunks", len(cached))
+            return [
+                self.located_document(doc_id, filing_id, chunk_idx, templates)
+                for filing_id, chunk_idx, doc_id in cached
+            ]
+
+        # Chunk ids by filing id and index. A canonical chunk also fills the
+        # positions of its near-duplicates in the other filings.
+        filing_chunks, document_ids, templates, _ = self.chunk_map()
+
+        # Step 1: Get top-k most similar chunks, optionally restricted to a set of documents
+        allowed_ids = None
+        if doc_keys is not None:
+            doc_keys = set(doc_keys)
+            allowed_ids = set().union(
+                *(document_ids.get(doc_key, ()) for doc_key in doc_keys)
+            )
+        top_ids = self.search_ids(query, k, mode=mode, allowed_ids=allowed_ids)
+
+        # Step 2: For each top chunk, add neighbors within window. The window is
+        # taken in the chunk's own filing, or, when restricted to doc_keys, in
+        # each requested filing the chunk appears in. Shared boilerplate is
+        # returned once, under the first filing it was found in.
+        expanded = {}
+        seen_ids = set()
+        for doc_id in top_ids:
+            locations = chunk_locations(docstore[doc_id])
+            if doc_keys is None:
+                locations = locations[:1]
+            else:
+                locations = [loc for loc in locations if loc[0] in doc_keys]
+            for filing_id, chunk_idx, _ in locations:
+                if chunk_idx is None or filing_id not in filing_chunks:
+                    continue
                 for offset in range(-window, window + 1):
-                    neighbor_idx = chunk_idx + offset  # type: ignore
-                    neighbor_doc = filing_chunks[filing_id].get(neighbor_idx)
-                    if neighbor_doc:
-                        key = (filing_id, neighbor_idx)
-                        expanded_chunks[key] = neighbor_doc
-
-        print(f"Found {len(expanded_chunks)} chunks")
-
-        # Step 5: Return as list (sorted by filing and chunk index if desired)
-        return sorted(
-            expanded_chunks.values(),
-            key=lambda d: (d.metadata.get("accession"), d.metadata.get("chunk_index")),
-        )
+                    neighbor_idx = chunk_idx + offset
+                    neighbor_id = filing_chunks[filing_id].get(neighbor_idx)
+                    if neighbor_id and neighbor_id not in seen_ids:
+                        seen_ids.add(neighbor_id)
+                        expanded[(filing_id, neighbor_idx)] = neighbor_id
+
+        print(f"Found {len(expanded)} chunks")
+        tracing.incr("retrieval.chunks", len(expanded))
+
+        # Step 3: Return as list sorted by filing and chunk index
+        result = [
+            [filing_id, chunk_idx, doc_id]
+            for (filing_id, chunk_idx), doc_id in sorted(expanded.items())
+        ]
+        self.query_cache.put("retrieval", cache_parts, result, self.version)
+        return [
+            self.located_document(doc_id, filing_id, chunk_idx, templates)
+            for filing_id, chunk_idx, doc_id in result
+        ]
+
+    def located_document(self, doc_id, filing_id, chunk_idx, templates):
+        """The chunk doc_id as it appears at chunk_idx of a filing: the stored
+        document, or for a near-duplicate a copy carrying that filing's
+        metadata, so prompts attribute the text to the right filing.
+        ``templates`` caches chunk metadata by document key."""
+        from langchain_core.documents import Document
+
+        docstore = self.index.docstore._dict  # type: ignore
+        doc = docstore[doc_id]
+        if common.document_key(doc.metadata) == filing_id:
+            return doc
+
+        if filing_id not in templates:
+            templates[filing_id] = next(
+                (
+                    d.metadata
+                    for d in docstore.values()
+                    if common.document_key(d.metadata) == filing_id
+                ),
+                None,
+            ) or metadata_from_document_key(filing_id, doc.metadata.get("ticker"))
+        metadata = dict(templates[filing_id])
+        metadata.pop("duplicates", None)
+        metadata["chunk_index"] = chunk_idx
+        return Document(page_content=doc.page_content, metadata=metadata)
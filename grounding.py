@@ -0,0 +1,250 @@
+"""Local grounding check of extracted events against their source text.
+
+Events whose drug, study, accession_number, size and time_period_expected can
+all be found in the text they were extracted from skip LLM validation; only
+events with an ungrounded or suspicious field are sent to Gemini. Every
+decision is written to the run trace as a ``grounding`` record for audit.
+
+The drug and study must be mentioned in the text. Size, time period and
+accession number must then be found next to one of those mentions, within
+the same filing or press release of the prompt, so a number from the
+financial statements or another program does not ground them.
+"""
+
+import difflib
+import re
+
+import common
+import tracing
+
+GROUNDED_FIELDS = ("drug", "study", "accession_number", "size", "time_period_expected")
+
+# Minimum difflib similarity for a value token to match a token of the text
+FUZZY_MATCH_THRESHOLD = 0.85
+
+# Characters on each side of a drug or study mention searched for the size,
+# time period and accession number of the event
+MENTION_WINDOW = 600
+
+# Characters before a year searched for its quarter, month or half
+PERIOD_CONTEXT = 30
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+# Header written by common.format_documents_for_prompt for each document
+DOCUMENT_HEADER_RE = re.compile(r"^Accession: *(\S*)", re.M)
+NUMBER_RE = re.compile(r"\d[\d,]*(?:\.\d+)?")
+YEAR_RE = re.compile(r"(?<!\d)(?:19|20)\d{2}(?!\d)")
+
+MONTHS = [
+    "january",
+    "february",
+    "march",
+    "april",
+    "may",
+    "june",
+    "july",
+    "august",
+    "september",
+    "october",
+    "november",
+    "december",
+]
+QUARTER_PHRASES = {
+    "1": ["first quarter", "q1", "1q"],
+    "2": ["second quarter", "q2", "2q"],
+    "3": ["third quarter", "q3", "3q"],
+    "4": ["fourth quarter", "q4", "4q"],
+}
+HALF_PHRASES = {
+    "1": ["first half", "h1", "1h"],
+    "2": ["second half", "h2", "2h"],
+}
+
+
+def contains_phrase(text, phrase):
+    return re.search(rf"(?<![a-z0-9]){re.escape(phrase)}(?![a-z0-9])", text) is not None
+
+
+class SourceText:
+    """The lowercased source text split into the documents of the prompt."""
+
+    def __init__(self, chunks):
+        raw = chunks if isinstance(chunks, str) else " ".join(chunks)
+        self.text = raw.lower()
+        self.vocabulary = set(WORD_RE.findall(self.text))
+        # (start offset, accession digits) of each document
+        self.documents = [
+            (m.start(), re.sub(r"[^0-9]", "", m.group(1)))
+            for m in DOCUMENT_HEADER_RE.finditer(raw)
+        ]
+        if not self.documents or self.documents[0][0] > 0:
+            self.documents.insert(0, (0, ""))
+        self._closest = {}
+
+    def closest_token(self, token):
+        if token not in self._closest:
+            if token in self.vocabulary:
+                self._closest[token] = token
+            else:
+                matches = difflib.get_close_matches(
+                    token, self.vocabulary, n=1, cutoff=FUZZY_MATCH_THRESHOLD
+                )
+                self._closest[token] = matches[0] if matches else None
+        return self._closest[token]
+
+    def mentions(self, name, ignore=()):
+        """Returns the (start, end) spans where a name occurs, its words matched
+        exactly or fuzzily, and how it matched."""
+        tokens = [t for t in WORD_RE.findall(name) if t not in ignore]
+        if not tokens:
+            return [], "generic"
+        matched = [self.closest_token(t) for t in tokens]
+        missing = [t for t, m in zip(tokens, matched) if m is None]
+        if missing:
+            return [], f"not found in source: {' '.join(missing)}"
+        pattern = r"(?<![a-z0-9])" + r"[^a-z0-9]+".join(map(re.escape, matched))
+        spans = [m.span() for m in re.finditer(pattern + r"(?![a-z0-9])", self.text)]
+        if not spans:
+            return [], "words not adjacent in source"
+        return spans, "exact" if matched == tokens else "fuzzy"
+
+    def windows(self, spans):
+        """Text around each span, clipped to its document, with the document's
+        accession number."""
+        windows = []
+        starts = [start for start, _ in self.documents]
+        for span_start, span_end in spans:
+            i = max(j for j, start in enumerate(starts) if start <= span_start)
+            doc_end = starts[i + 1] if i + 1 < len(starts) else len(self.text)
+            start = max(starts[i], span_start - MENTION_WINDOW)
+            end = min(doc_end, span_end + MENTION_WINDOW)
+            windows.append((self.text[start:end], self.documents[i][1]))
+        return windows
+
+
+def check_accession_number(value, windows):
+    if not common.normalize_event_value(value):
+        return True, "not specified"
+    accession = re.sub(r"[^0-9]", "", str(value))
+    if any(accession == doc_accession for _, doc_accession in windows):
+        return True, "exact"
+    return False, "not the accession of a document mentioning the event"
+
+
+def check_size(value, windows):
+    if not common.normalize_event_value(value):
+        return True, "not specified"
+    numbers = [n.replace(",", "") for n in NUMBER_RE.findall(str(value))]
+    if not numbers:
+        return False, "not a number"
+    nearby = set()
+    for text, _ in windows:
+        nearby.update(n.replace(",", "") for n in NUMBER_RE.findall(text))
+    missing = [n for n in numbers if n not in nearby]
+    if missing:
+        return False, f"not near a mention: {', '.join(missing)}"
+    return True, "near mention"
+
+
+def check_period_in_window(period, text):
+    """Whether the period is stated in the text: literally, or as its year
+    with the quarter, month or half of the year right next to it."""
+    compact = period.replace(" ", "")
+    if contains_phrase(text, period) or contains_phrase(text, compact):
+        return True
+    years = YEAR_RE.findall(period)
+    if not years or not all(contains_phrase(text, year) for year in years):
+        return False
+
+    phrases = None
+    quarter = re.search(r"\bq([1-4])\b|\b([1-4])q\b|q([1-4])\b", period)
+    half = re.search(r"\bh([12])\b|\b([12])h\b|h([12])\b", period)
+    if quarter:
+        q = next(g for g in quarter.groups() if g)
+        phrases = QUARTER_PHRASES[q] + MONTHS[3 * (int(q) - 1) : 3 * int(q)]
+    elif half:
+        h = next(g for g in half.groups() if g)
+        phrases = HALF_PHRASES[h]
+    if phrases is None:
+        return True
+
+    for match in re.finditer(re.escape(years[0]), text):
+        # "second quarter of 2026", "June 30, 2026", "Q2 2026" or "2026 Q2"
+        nearby = text[max(0, match.start() - PERIOD_CONTEXT) : match.end() + 4]
+        if any(contains_phrase(nearby, p) for p in phrases):
+            return True
+    return False
+
+
+def check_time_period_expected(value, windows):
+    period = common.normalize_event_value(value)
+    if not period:
+        return True, "not specified"
+    if not YEAR_RE.search(period):
+        return False, "no year"
+    if any(check_period_in_window(period, text) for text, _ in windows):
+        return True, "near mention"
+    return False, "not near a mention"
+
+
+def check_event(event, source):
+    """Returns {field: (grounded, reason)} for the GROUNDED_FIELDS of an event."""
+    checks = {}
+
+    drug = common.normalize_drug_name(event.drug)
+    if drug:
+        drug_spans, reason = source.mentions(drug)
+        checks["drug"] = (bool(drug_spans), reason)
+    else:
+        # An event without a drug cannot be identified, let the LLM look at it
+        drug_spans = []
+        checks["drug"] = (False, "not specified")
+
+    study = common.normalize_event_value(event.study)
+    if study:
+        study_spans, reason = source.mentions(study, ignore=common.STUDY_GENERIC_WORDS)
+        checks["study"] = (bool(study_spans) or reason == "generic", reason)
+    else:
+        study_spans = []
+        checks["study"] = (True, "not specified")
+
+    windows = source.windows(drug_spans + study_spans)
+    checks["accession_number"] = check_accession_number(event.accession_number, windows)
+    checks["size"] = check_size(event.size, windows)
+    checks["time_period_expected"] = check_time_period_expected(
+        event.time_period_expected, windows
+    )
+    return {field: checks[field] for field in GROUNDED_FIELDS}
+
+
+def precheck_events(events, search_chunks):
+    """Splits events into those grounded in the source text and those that
+    still need LLM validation, logging the decision for each event."""
+    source = SourceText(search_chunks)
+    grounded, needs_validation = [], []
+    for event in events:
+        checks = check_event(event, source)
+        ungrounded = [field for field, (ok, _) in checks.items() if not ok]
+        tracing.emit(
+            {
+                "type": "grounding",
+                "drug": event.drug,
+                "study": event.study,
+                "accession_number": event.accession_number,
+                "routed_to_llm": bool(ungrounded),
+                "ungrounded_fields": ungrounded,
+                "checks": {field: reason for field, (_, reason) in checks.items()},
+            }
+        )
+        if ungrounded:
+            needs_validation.append(event)
+        else:
+            grounded.append(event)
+
+    tracing.incr("validation.grounded_locally", len(grounded))
+    tracing.incr("validation.routed_to_llm", len(needs_validation))
+    print(
+        f"Grounded {len(grounded)} of {len(events)} events locally, "
+        f"{len(needs_validation)} need LLM validation"
+    )
+    return grounded, needs_validation
@@ -0,0 +1,214 @@
+import os
+import threading
+import time
+from collections import deque
+import cfg
+import tracing
+
+API_KEY_ENV_VARS = ["google_api_key", "google_api_key2", "google_api_key3"]
+DEFAULT_MODEL = "gemini-2.5-pro"
+RATE_LIMIT_COOLDOWN = 60.0
+# Further attempts on the next available key after a rate-limit error
+RATE_LIMIT_RETRIES = 2
+
+
+def default_client_factory(api_key, model, temperature):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    return ChatGoogleGenerativeAI(
+        model=model, temperature=temperature, google_api_key=api_key
+    )
+
+
+class KeyState:
+    """Usage of one API key: in-flight requests, a sliding one-minute window of
+    request timestamps for quota tracking, and a cooldown after rate limiting."""
+
+    def __init__(self, name, api_key):
+        self.name = name
+        self.api_key = api_key
+        self.in_flight = 0
+        self.recent_calls = deque()
+        self.total_calls = 0
+        self.failures = 0
+        self.cooldown_until = 0.0
+
+    def prune(self, now):
+        while self.recent_calls and now - self.recent_calls[0] >= 60:
+            self.recent_calls.popleft()
+
+
+class LLMClientPool:
+    """Process-wide registry of Gemini chat clients.
+
+    One client is created per (key, model, temperature, output schema) and
+    reused across calls, so HTTP connections are kept alive. Each request goes
+    to the least-loaded key that is under its per-minute quota and not cooling
+    down after a rate-limit error. All bookkeeping is guarded by a lock, so a
+    pool can be shared by concurrent workers.
+    """
+
+    def __init__(self, api_keys=None, requests_per_minute=60, client_factory=None):
+        if api_keys is None:
+            cfg.load_env()
+            api_keys = {}
+            for env_var in API_KEY_ENV_VARS:
+                key = os.getenv(env_var)
+                if key and key not in api_keys.values():
+                    api_keys[env_var] = key
+            if not api_keys and os.getenv("GOOGLE_API_KEY"):
+                api_keys["GOOGLE_API_KEY"] = os.environ["GOOGLE_API_KEY"]
+        if not api_keys:
+            raise RuntimeError(
+                f"No Gemini API key configured, set one of {API_KEY_ENV_VARS}"
+            )
+
+        self.keys = [KeyState(name, key) for name, key in api_keys.items()]
+        self.requests_per_minute = requests_per_minute
+        self.client_factory = client_factory or default_client_factory
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+
+    def _acquire_key(self):
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                available = []
+                for state in self.keys:
+                    state.prune(now)
+                    if (
+                        state.cooldown_until <= now
+                        and len(state.recent_calls) < self.requests_per_minute
+                    ):
+                        available.append(state)
+
+                if available:
+                    state = min(
+                        available,
+                        key=lambda s: (s.in_flight, len(s.recent_calls), s.total_calls),
+                    )
+                    state.in_flight += 1
+                    state.total_calls += 1
+                    state.recent_calls.append(now)
+                    return state
+
+                # Every key is exhausted: wait for the earliest one to free up.
+                # The quota window only holds back keys at their quota.
+                wait = min(
+                    max(
+                        s.cooldown_until - now,
+                        (
+                            60 - (now - s.recent_calls[0])
+                            if len(s.recent_calls) >= self.requests_per_minute
+                            else 0
+                        ),
+                    )
+                    for s in self.keys
+                )
+                self._released.wait(timeout=max(wait, 0.05))
+
+    def _release_key(self, state, error=None):
+        with self._lock:
+            state.in_flight -= 1
+            if error is not None:
+                state.failures += 1
+                if is_rate_limit_error(error):
+                    state.cooldown_until = time.monotonic() + RATE_LIMIT_COOLDOWN
+            self._released.notify_all()
+
+    def _client(self, state, model, temperature, schema):
+        cache_key = (state.name, model, temperature, schema)
+        with self._lock:
+            client = self._clients.get(cache_key)
+        if client is not None:
+            return client
+
+        # Built outside the lock so other workers are not held up; if two
+        # workers race, the first client stored wins
+        client = self.client_factory(state.api_key, model, temperature)
+        if schema is not None:
+            client = client.with_structured_output(schema, include_raw=True)
+        with self._lock:
+            return self._clients.setdefault(cache_key, client)
+
+    def invoke(self, prompt, model=DEFAULT_MODEL, temperature=0, schema=None):
+        """Sends a prompt through the least-loaded key. With ``schema`` the
+        response is parsed into that pydantic model. A rate-limited request is
+        retried up to RATE_LIMIT_RETRIES times on the next available key."""
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            state = self._acquire_key()
+            try:
+                with tracing.timed("llm.invoke", model=model, key=state.name):
+                    response = self._client(state, model, temperature, schema).invoke(
+                        prompt
+                    )
+            except Exception as e:
+                self._release_key(state, error=e)
+                if attempt < RATE_LIMIT_RETRIES and is_rate_limit_error(e):
+                    tracing.incr("llm.rate_limit_retries")
+                    continue
+                raise
+            self._release_key(state)
+            break
+
+        # Structured clients return {"raw": AIMessage, "parsed": ..., "parsing_error": ...}
+        raw = response
+        if isinstance(response, dict) and "raw" in response:
+            if response.get("parsing_error") is not None:
+                raise response["parsing_error"]
+            raw, response = response["raw"], response["parsed"]
+        record_usage(prompt, raw)
+        return response
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            stats = {}
+            for state in self.keys:
+                state.prune(now)
+                stats[state.name] = {
+                    "in_flight": state.in_flight,
+                    "calls_last_minute": len(state.recent_calls),
+                    "total_calls": state.total_calls,
+                    "failures": state.failures,
+                    "cooling_down": state.cooldown_until > now,
+                }
+            return stats
+
+
+def record_usage(prompt, message):
+    """Adds the token usage reported with a response to the run trace,
+    estimating prompt tokens at four characters each when none is reported."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    tracing.incr("llm.calls")
+    if usage:
+        tracing.incr("llm.prompt_tokens", usage.get("input_tokens", 0))
+        tracing.incr("llm.output_tokens", usage.get("output_tokens", 0))
+    else:
+        tracing.incr("llm.prompt_tokens_estimated", len(str(prompt)) // 4)
+
+
+def is_rate_limit_error(error):
+    text = f"{type(error).__name__} {error}"
+    return "429" in text or "ResourceExhausted" in text or "quota" in text.lower()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Returns the process-wide pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = LLMClientPool()
+        return _pool
+
+
+def set_pool(pool):
+    """Replaces the process-wide pool, e.g. with one using different keys or quotas."""
+    global _pool
+    with _pool_lock:
+        _pool = pool
@@ -0,0 +1,61 @@
+"""Maintenance of the FAISS index built by run_extract.
+
+Usage:
+    python maintain_index.py delete 0001689548-25-000012 "PRAX|press release|2025-05-01"
+    python maintain_index.py delete-ticker PRAX
+    python maintain_index.py delete-ticker PRAX --press-releases
+    python maintain_index.py compact
+"""
+
+import argparse
+
+from event_store import EventStore
+from faiss_manager import FAISSManager
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--index-path", default="faiss_index")
+    parser.add_argument("--hash-tracker-path", default="indexed_filings.json")
+    parser.add_argument(
+        "--events-db",
+        default="output/events.db",
+        help="event store whose records of deleted documents are retired",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    delete = commands.add_parser(
+        "delete", help="delete documents by accession number or press release key"
+    )
+    delete.add_argument("document_keys", nargs="+")
+
+    delete_ticker = commands.add_parser(
+        "delete-ticker", help="delete every document of a ticker"
+    )
+    delete_ticker.add_argument("ticker")
+    delete_ticker.add_argument(
+        "--press-releases", action="store_true", help="only delete press releases"
+    )
+
+    commands.add_parser("compact", help="drop deleted vectors from the index")
+    args = parser.parse_args()
+
+    store = EventStore(args.events_db)
+    manager = FAISSManager(
+        index_path=args.index_path,
+        hash_tracker_path=args.hash_tracker_path,
+        event_store=store,
+    )
+    try:
+        if args.command == "delete":
+            manager.delete_documents(args.document_keys)
+        elif args.command == "delete-ticker":
+            manager.delete_ticker(args.ticker, press_releases_only=args.press_releases)
+        elif args.command == "compact":
+            manager.compact()
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
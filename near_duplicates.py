@@ -0,0 +1,132 @@
+import os
+import pickle
+import re
+import zlib
+
+import numpy as np
+
+MERSENNE_PRIME = (1 << 61) - 1
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+# Settings that come from the code rather than from a saved index
+THRESHOLD_SETTINGS = ("threshold", "min_length_ratio")
+
+
+class MinHashLSH:
+    """MinHash signatures over word shingles with banded locality-sensitive
+    hashing, used to find chunks whose text nearly duplicates an indexed one.
+
+    Candidates from the LSH buckets whose Jaccard similarity estimated from
+    the signatures reaches ``threshold`` are returned by query(). Callers
+    confirm them with is_duplicate(), which only accepts text whose words
+    appear verbatim, in order, in the candidate (ignoring case, punctuation
+    and whitespace) and which is at least ``min_length_ratio`` as long. A
+    changed date, number or status word never passes, so updated guidance is
+    not folded into older text.
+    """
+
+    def __init__(
+        self,
+        num_perm=64,
+        bands=16,
+        shingle_size=5,
+        threshold=0.85,
+        min_length_ratio=0.95,
+        seed=1,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        self.min_length_ratio = min_length_ratio
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.signatures = {}
+        self.buckets = {}
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def normalize(self, text):
+        return " ".join(WORD_RE.findall(text.lower()))
+
+    def shingles(self, text):
+        words = WORD_RE.findall(text.lower())
+        n = max(1, len(words) - self.shingle_size + 1)
+        return {" ".join(words[i : i + self.shingle_size]) for i in range(n)}
+
+    def signature(self, text):
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode()) for s in self.shingles(text)), dtype=np.uint64
+        )
+        # a < 2**31 and x, b < 2**32, so a * x + b cannot overflow 64 bits
+        permuted = (
+            self.a[:, None] * hashes[None, :] + self.b[:, None]
+        ) % MERSENNE_PRIME
+        return permuted.min(axis=1).astype(np.uint64)
+
+    def _band_keys(self, signature):
+        return [
+            (band, signature[band * self.rows : (band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def query(self, signature):
+        """Returns the ids of stored texts whose estimated similarity reaches
+        the threshold, most similar first."""
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates.update(self.buckets.get(key, ()))
+
+        scored = []
+        for doc_id in candidates:
+            similarity = float(np.mean(self.signatures[doc_id] == signature))
+            if similarity >= self.threshold:
+                scored.append((similarity, doc_id))
+        return [doc_id for _, doc_id in sorted(scored, reverse=True)]
+
+    def is_duplicate(self, text, canonical_text):
+        """Whether text is a near-exact copy of canonical_text: contained in it
+        word for word and nearly as long."""
+        text, canonical_text = self.normalize(text), self.normalize(canonical_text)
+        return (
+            len(text) >= self.min_length_ratio * len(canonical_text)
+            and f" {text} " in f" {canonical_text} "
+        )
+
+    def insert(self, doc_id, signature):
+        self.signatures[doc_id] = signature
+        for key in self._band_keys(signature):
+            self.buckets.setdefault(key, []).append(doc_id)
+
+    def remove(self, doc_id):
+        signature = self.signatures.pop(doc_id, None)
+        if signature is None:
+            return
+        for key in self._band_keys(signature):
+            bucket = self.buckets.get(key, [])
+            if doc_id in bucket:
+                bucket.remove(doc_id)
+            if not bucket:
+                self.buckets.pop(key, None)
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(self.__dict__, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        for name in THRESHOLD_SETTINGS:
+            state.pop(name, None)
+        index.__dict__.update(state)
+        return index
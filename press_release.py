@@ -3,24 +3,17 @@ import time
 from datetime import datetime
 from typing import List, Dict
 
-import google.generativeai as genai
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
 import faiss_manager
-
-# Configure Gemini API
-GEMINI_API_KEY = os.getenv("google_api_key2") or "your_api_key_here"
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel("models/gemini-2.5-pro")
+import llm_pool
+import tracing
 
 # Suppress warnings
 os.environ["GRPC_VERBOSITY"] = "NONE"
 
+# Seconds to let GlobeNewswire render search result and article pages
+SEARCH_PAGE_DELAY = 3
+ARTICLE_PAGE_DELAY = 2
+
 
 def classify_press_release_titles(titles: List[str]) -> List[str]:
     """
@@ -46,8 +39,8 @@ def classify_press_release_titles(titles: List[str]) -> List[str]:
     for i, title in enumerate(titles):
         prompt += f"{i+1}. {title}\n"
 
-    response = model.generate_content(prompt)
-    text = response.text.strip()
+    response = llm_pool.get_pool().invoke(prompt)
+    text = response.content.strip()
 
     # Parse response lines that start with a number and extract the title text
     press_release_titles = []
@@ -62,17 +55,26 @@ def classify_press_release_titles(titles: List[str]) -> List[str]:
 
 
 def scrape_press_release(
-    ticker: str, chromedriver_path: str, start_date: str = "2023-01-01"
+    ticker: str, chromedriver_path: str, start_date: str = "2023-01-01", driver=None
 ) -> tuple[list, list]:
+    from bs4 import BeautifulSoup
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.chrome.options import Options
+
     print(f"\nScraping press releases for {ticker} (since {start_date})...")
 
-    options = Options()
-    options.add_argument("--headless")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--window-size=1920,1080")
+    if driver is None:
+        options = Options()
+        options.add_argument("--headless")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--window-size=1920,1080")
 
-    service = Service(executable_path=chromedriver_path)
-    driver = webdriver.Chrome(service=service, options=options)
+        service = Service(executable_path=chromedriver_path)
+        driver = webdriver.Chrome(service=service, options=options)
 
     base_url_template = f"https://www.globenewswire.com/en/search/keyword/{ticker}/load/before?page={{page}}&pageSize=100"
 
@@ -83,11 +85,12 @@ def scrape_press_release(
 
     while True:
         url = base_url_template.format(page=page)
-        driver.get(url)
+        with tracing.timed("http.globenewswire.search", page=page):
+            driver.get(url)
         WebDriverWait(driver, 10).until(
             EC.presence_of_element_located((By.CLASS_NAME, "mainLink"))
         )
-        time.sleep(3)
+        time.sleep(SEARCH_PAGE_DELAY)
 
         soup = BeautifulSoup(driver.page_source, "html.parser")
         articles = soup.find_all("div", class_="mainLink")
@@ -163,8 +166,9 @@ def scrape_press_release(
     print(f"Fetching full text for {len(press_releases_metadata)} press releases...")
     for entry in press_releases_metadata:
         try:
-            driver.get(entry["link"])
-            time.sleep(2)
+            with tracing.timed("http.globenewswire.article"):
+                driver.get(entry["link"])
+            time.sleep(ARTICLE_PAGE_DELAY)
             article_html = driver.page_source
             article_soup = BeautifulSoup(article_html, "html.parser")
             content_div = article_soup.find("div", class_="main-container-content")
@@ -175,6 +179,7 @@ def scrape_press_release(
             )
             press_list.append(full_text)
             metadata_list.append(entry)
+            tracing.incr("press_releases.fetched")
         except Exception as e:
             print(f"❌ Error fetching article text for {entry['link']}: {e}")
             continue
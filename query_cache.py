@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+class QueryCache:
+    """LRU cache in front of a SQLite table, for query embeddings and
+    retrieval results.
+
+    Entries live in a namespace (e.g. ``embedding``, ``retrieval``) under a
+    key built from JSON-serializable parts, and optionally carry the index
+    version they were computed against so stale ones can be pruned. Entries
+    without a version, such as query embeddings, are instead evicted oldest
+    written first once a namespace holds more than ``max_rows`` on disk. The
+    SQLite file is shared by every process using the same index and is only
+    created on the first write.
+    """
+
+    def __init__(self, path, max_entries=1024, max_rows=50000):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.entries = OrderedDict()
+        self.conn = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(parts):
+        return hashlib.md5(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+    def _connect(self, create=False):
+        if self.conn is None and (create or os.path.exists(self.path)):
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            with self.conn:
+                self.conn.execute("""
+                    CREATE TABLE IF NOT EXISTS cache (
+                        namespace TEXT NOT NULL,
+                        key TEXT NOT NULL,
+                        version INTEGER NOT NULL,
+                        value BLOB NOT NULL,
+                        PRIMARY KEY (namespace, key)
+                    )
+                    """)
+        return self.conn
+
+    def _remember(self, memory_key, value):
+        self.entries[memory_key] = value
+        self.entries.move_to_end(memory_key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def get(self, namespace, parts):
+        key = self.make_key(parts)
+        with self._lock:
+            if (namespace, key) in self.entries:
+                self.entries.move_to_end((namespace, key))
+                return self.entries[(namespace, key)]
+
+            conn = self._connect()
+            if conn is None:
+                return None
+            row = conn.execute(
+                "SELECT value FROM cache WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+            if row is None:
+                return None
+            value = pickle.loads(row[0])
+            self._remember((namespace, key), value)
+            return value
+
+    def put(self, namespace, parts, value, version=0):
+        key = self.make_key(parts)
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._remember((namespace, key), value)
+            conn = self._connect(create=True)
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (namespace, key, version, value) VALUES (?, ?, ?, ?)",
+                    (namespace, key, version, blob),
+                )
+                # INSERT OR REPLACE assigns a new rowid, so rowids follow write order
+                conn.execute(
+                    """
+                    DELETE FROM cache WHERE namespace = ? AND rowid <= (
+                        SELECT rowid FROM cache WHERE namespace = ?
+                        ORDER BY rowid DESC LIMIT 1 OFFSET ?
+                    )
+                    """,
+                    (namespace, namespace, self.max_rows),
+                )
+
+    def prune(self, namespace, version):
+        """Drops the on-disk entries of a namespace computed before ``version``.
+        In-memory entries are keyed by version and simply age out."""
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            with conn:
+                conn.execute(
+                    "DELETE FROM cache WHERE namespace = ? AND version < ?",
+                    (namespace, version),
+                )
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
@@ -1,58 +1,104 @@
-import cfg
-import adtdatasources.es
 import extract_kpi2
 import common
+import event_dedup
 import pandas as pd
 from faiss_manager import FAISSManager
+from event_store import EventStore
+import tracing
 import press_release
 from datetime import datetime
 
 
-def company():
+def company(ticker="PRAX", export_excel=False):
     search_metric = "all clinical trial activity, study results, and regulatory events"
 
-    vector_store = FAISSManager()
+    store = EventStore()
+    run_id = store.start_run(ticker)
+    tracing.start_run(run_id)
 
-    today = datetime.today()
+    try:
+        with tracing.stage("index.load"):
+            vector_store = FAISSManager(event_store=store)
 
-    # Go back 3 years
-    three_years_ago = today.replace(year=today.year - 3)
+        today = datetime.today()
 
-    # Return Jan 1 of that year
-    start_date = datetime(year=three_years_ago.year, month=1, day=1).strftime(
-        "%Y-%m-%d"
-    )
+        # Go back 3 years
+        three_years_ago = today.replace(year=today.year - 3)
 
-    filings, metadatas = common.get_filing_sections("PRAX", start_date)
-    vector_store.add_filings(filings, metadatas)
+        # Return Jan 1 of that year
+        start_date = datetime(year=three_years_ago.year, month=1, day=1).strftime(
+            "%Y-%m-%d"
+        )
 
-    filings, metadatas = press_release.get_press_releases(["PRAX"], start_date)
-    vector_store.add_filings(filings, metadatas, isPressRelease=True)
+        with tracing.stage("sec_filings.fetch"):
+            filings, metadatas = common.get_filing_sections(
+                ticker, start_date, hash_tracker=vector_store.hash_tracker
+            )
+        with tracing.stage("index.add_filings"):
+            vector_store.add_filings(filings, metadatas)
 
-    documents = vector_store.similarity_search_with_context(
-        search_metric, k=30, window=2
-    )
+        with tracing.stage("press_releases.fetch"):
+            filings, metadatas = press_release.get_press_releases([ticker], start_date)
+        with tracing.stage("index.add_press_releases"):
+            vector_store.add_filings(filings, metadatas, isPressRelease=True)
 
-    all_results = []
-    chunks = common.format_documents_for_prompt(
-        documents, chunk_size=900000, chunk_overlap=0
-    )
+        # Only extract from documents indexed since the last completed run
+        extracted_keys = store.extracted_documents(ticker)
+        pending_keys = vector_store.document_keys(ticker) - extracted_keys
+        print(
+            f"Run {run_id}: {len(pending_keys)} new documents to extract for {ticker} "
+            f"({len(extracted_keys)} already extracted)"
+        )
 
-    for idx, chunk in enumerate(chunks):
-        print(f"Processing chunk {idx + 1}/{len(chunks)}")
-        result = extract_kpi2.extract_kpi(search_metric, chunk)  # Via gemini api
-        if result.size > 0:
-            all_results.append(result)
+        all_results = []
+        if pending_keys:
+            with tracing.stage("retrieval"):
+                documents = vector_store.similarity_search_with_context(
+                    search_metric,
+                    k=30,
+                    window=2,
+                    doc_keys=pending_keys,
+                    mode="hybrid",
+                )
 
-    df_final = pd.concat(all_results, ignore_index=True)
-    df_final.sort_values(by="company")
-    df_final.drop_duplicates(inplace=True)
-    df_final.reset_index(drop=True, inplace=True)
+            with tracing.stage("format_prompt"):
+                chunks = common.format_documents_for_prompt(
+                    documents, chunk_size=900000, chunk_overlap=0
+                )
 
-    try:
+            for idx, chunk in enumerate(chunks):
+                print(f"Processing chunk {idx + 1}/{len(chunks)}")
+                with tracing.stage("extract", chunk=idx):
+                    result = extract_kpi2.extract_kpi(
+                        search_metric, chunk, store=store, run_id=run_id
+                    )  # Via gemini api
+                if result.size > 0:
+                    all_results.append(result)
+
+        if all_results:
+            with tracing.stage("dedup"):
+                df_new = event_dedup.dedup_events(
+                    pd.concat(all_results, ignore_index=True)
+                )
+            with tracing.stage("store.append"):
+                store.append_events(run_id, "validated", df_new)
+    except Exception:
+        store.finish_run(run_id, status="failed")
+        tracing.print_summary()
+        raise
+
+    store.finish_run(run_id, doc_keys=pending_keys)
+
+    df_final = store.current_events(ticker)
+    print(f"{len(df_final)} current events for {ticker}")
+
+    if export_excel and not df_final.empty:
+        df_final = df_final.sort_values(by="company").reset_index(drop=True)
         common.write_df_to_excel(df_final, "./output/kpi_validated.xlsx")
-    except Exception as e:
-        print(f"Error writing DataFrame to Excel: {e}")
+
+    store.close()
+    tracing.print_summary()
 
 
-company()
+if __name__ == "__main__":
+    company(export_excel=True)
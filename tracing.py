@@ -0,0 +1,178 @@
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+def current_rss_mb():
+    """Resident set size of this process, falling back to the peak where
+    /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+class Tracer:
+    """Collects per-stage wall time and memory, counters (embeddings, prompt
+    tokens, cache hits, ...) and call latencies (HTTP, LLM) for one run, and
+    writes every record as a JSON line to ``<trace_dir>/<run_id>.jsonl``."""
+
+    def __init__(self):
+        self.run_id = None
+        self.path = None
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.stages = defaultdict(lambda: {"calls": 0, "seconds": 0.0})
+        self.counters = defaultdict(int)
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.started_at = time.perf_counter()
+
+    def start_run(self, run_id, trace_dir="output/traces"):
+        os.makedirs(trace_dir, exist_ok=True)
+        with self._lock:
+            self.run_id = run_id
+            self.path = os.path.join(trace_dir, f"{run_id}.jsonl")
+            self.reset()
+        self.emit({"type": "run_start", "rss_mb": round(current_rss_mb(), 1)})
+
+    def emit(self, record):
+        if self.path is None:
+            return
+        record = {"run_id": self.run_id, "ts": time.time(), **record}
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+    @contextmanager
+    def stage(self, name, **attrs):
+        """Times a pipeline stage and records the memory it used."""
+        rss_before = current_rss_mb()
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            rss_after = current_rss_mb()
+            with self._lock:
+                self.stages[name]["calls"] += 1
+                self.stages[name]["seconds"] += seconds
+            self.emit(
+                {
+                    "type": "stage",
+                    "name": name,
+                    "seconds": round(seconds, 4),
+                    "rss_mb": round(rss_after, 1),
+                    "rss_delta_mb": round(rss_after - rss_before, 1),
+                    "peak_rss_mb": round(peak_rss_mb(), 1),
+                    "error": error,
+                    **attrs,
+                }
+            )
+
+    @contextmanager
+    def timed(self, name, **attrs):
+        """Records the latency of a single external call such as an HTTP request."""
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self.latencies[name].append(seconds)
+                if error:
+                    self.errors[name] += 1
+            self.emit(
+                {
+                    "type": "call",
+                    "name": name,
+                    "seconds": round(seconds, 4),
+                    "error": error,
+                    **attrs,
+                }
+            )
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def summary(self):
+        with self._lock:
+            calls = {}
+            for name, values in self.latencies.items():
+                ordered = sorted(values)
+                calls[name] = {
+                    "count": len(ordered),
+                    "errors": self.errors.get(name, 0),
+                    "total_seconds": round(sum(ordered), 3),
+                    "p50_seconds": round(ordered[len(ordered) // 2], 3),
+                    "max_seconds": round(ordered[-1], 3),
+                }
+            return {
+                "wall_seconds": round(time.perf_counter() - self.started_at, 3),
+                "peak_rss_mb": round(peak_rss_mb(), 1),
+                "stages": {
+                    name: {"calls": s["calls"], "seconds": round(s["seconds"], 3)}
+                    for name, s in self.stages.items()
+                },
+                "calls": calls,
+                "counters": dict(self.counters),
+            }
+
+    def print_summary(self):
+        summary = self.summary()
+        self.emit({"type": "summary", **summary})
+
+        print(f"\nRun {self.run_id} trace summary")
+        print(
+            f"Wall time: {summary['wall_seconds']:.1f}s, peak RSS: {summary['peak_rss_mb']:.0f} MB"
+        )
+        total = summary["wall_seconds"] or 1.0
+        for name, s in sorted(
+            summary["stages"].items(), key=lambda item: -item[1]["seconds"]
+        ):
+            print(
+                f"  stage {name:<32} {s['seconds']:>9.2f}s {100 * s['seconds'] / total:>5.1f}%  ({s['calls']} calls)"
+            )
+        for name, c in sorted(summary["calls"].items()):
+            print(
+                f"  call  {name:<32} {c['count']:>5} calls, {c['total_seconds']:.2f}s total, "
+                f"p50 {c['p50_seconds']:.3f}s, max {c['max_seconds']:.3f}s, {c['errors']} errors"
+            )
+        for name, value in sorted(summary["counters"].items()):
+            print(f"  count {name:<32} {value}")
+        if self.path:
+            print(f"Trace written to {self.path}")
+
+
+tracer = Tracer()
+
+start_run = tracer.start_run
+emit = tracer.emit
+stage = tracer.stage
+timed = tracer.timed
+incr = tracer.incr
+print_summary = tracer.print_summary